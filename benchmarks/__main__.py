@@ -0,0 +1,171 @@
+"""Drives the users API in-process and reports latency percentiles
+
+Usage: python -m benchmarks [--scenario read] [--baseline file.json]
+Obs: --database env keeps the DB_* variables already set, which is
+how it runs against a local postgres, otherwise a seeded
+throwaway sqlite file is used"""
+import argparse
+import asyncio
+import json
+import os
+import pathlib
+import platform
+import shutil
+import sys
+import tempfile
+import uuid
+
+BENCH_DIR = pathlib.Path(__file__).resolve().parent
+DEFAULT_BASELINE = BENCH_DIR / 'baseline.json'
+SEED_PASSWORD = 'bench-password'
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks')
+    parser.add_argument(
+        '--scenario',
+        action='append',
+        choices=('read', 'signup', 'patch'),
+        help='scenario to run, may be repeated, defaults to all',
+    )
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--warmup', type=int, default=50)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument(
+        '--hot-keys',
+        type=int,
+        default=10,
+        help='users targeted by the patch scenario',
+    )
+    parser.add_argument(
+        '--database', choices=('sqlite', 'env'), default='sqlite'
+    )
+    parser.add_argument('--output', type=pathlib.Path)
+    parser.add_argument(
+        '--baseline', type=pathlib.Path, default=DEFAULT_BASELINE
+    )
+    parser.add_argument(
+        '--max-regression',
+        type=float,
+        default=10,
+        help='percentage a metric may get worse before failing',
+    )
+    parser.add_argument(
+        '--save-baseline',
+        action='store_true',
+        help='overwrite the baseline with the results of this run',
+    )
+    return parser
+
+
+async def seed(app, users: int) -> list[str]:
+    """Creates the schema and inserts :param:`users` users
+    sharing one precomputed digest, so seeding skips argon2"""
+    import sqlalchemy as sa
+
+    from src.core.database import get_metadata
+    from src.users.table import user_table
+    from utils.providers import password
+    from utils.timezone import now
+
+    run_id = uuid.uuid4().hex[:8]
+    digest = password.hash(SEED_PASSWORD)
+    joined = now()
+    emails = [f'{run_id}-{index}@seed.bench' for index in range(users)]
+    rows = [
+        {
+            'external_id': uuid.uuid4(),
+            'name': 'Seed',
+            'email': email,
+            'normalized_email': email,
+            'password': digest,
+            'birth_date': joined.date(),
+            'date_joined': joined,
+        }
+        for email in emails
+    ]
+    async with app.state.database_provider.acquire().begin() as conn:
+        await conn.run_sync(get_metadata().create_all)
+        await conn.execute(sa.insert(user_table), rows)
+    return emails
+
+
+async def run(args: argparse.Namespace):
+    import httpx
+
+    from benchmarks.runner import run_scenario
+    from benchmarks.scenarios import get_scenarios
+    from src.main import get_application
+
+    app = get_application()
+    await app.router.startup()
+    try:
+        emails = await seed(app, args.users)
+        scenarios = get_scenarios(emails, SEED_PASSWORD, args.hot_keys)
+        transport = httpx.ASGITransport(app=app)
+        results = {}
+        async with httpx.AsyncClient(
+            transport=transport, base_url='http://bench'
+        ) as client:
+            for name in args.scenario or scenarios:
+                results[name] = await run_scenario(
+                    client,
+                    scenarios[name],
+                    args.requests,
+                    args.concurrency,
+                    args.warmup,
+                )
+    finally:
+        await app.router.shutdown()
+    return results
+
+
+def main(argv: list[str] | None = None) -> int:
+    from benchmarks.runner import compare
+
+    args = get_parser().parse_args(argv)
+    os.environ.setdefault('TOKEN_SECRET_KEYS', 'bench:bench-secret')
+    # every simulated client shares one address
+    os.environ.setdefault('RATE_LIMIT_ENABLED', 'false')
+    # a single process, so the per worker cache stays consistent
+    os.environ.setdefault('CACHE_BACKEND', 'memory')
+    tmpdir = None
+    if args.database == 'sqlite':
+        tmpdir = tempfile.mkdtemp(prefix='bench')
+        os.environ['DB_DRIVER'] = 'sqlite'
+        os.environ['DB_HOST'] = os.path.join(tmpdir, 'bench.sqlite3')
+    try:
+        results = asyncio.run(run(args))
+    finally:
+        if tmpdir is not None:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+    report = {
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'database': os.environ.get('DB_DRIVER', 'postgres'),
+        },
+        'scenarios': results,
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        args.output.write_text(output + '\n')
+    if args.save_baseline:
+        args.baseline.write_text(output + '\n')
+        return 0
+    if not args.baseline.is_file():
+        print(f'No baseline at {args.baseline}, skipping', file=sys.stderr)
+        return 0
+    baseline = json.loads(args.baseline.read_text())['scenarios']
+    failures = list(compare(results, baseline, args.max_regression))
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,109 @@
+"""Compares index insert throughput and index size per external id strategy
+
+Usage: python -m benchmarks.external_id [--rows 2000000]
+Obs: --database env uses the DB_* variables, otherwise a
+throwaway sqlite file is used"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import sqlalchemy as sa
+
+from utils.guid import GUID
+from utils.providers.external_id import GENERATORS, Strategy
+
+INDEX_SIZE_QUERIES = {
+    'sqlite': 'SELECT SUM(pgsize) FROM dbstat WHERE name = :name',
+    'postgresql': 'SELECT pg_relation_size(CAST(:name AS regclass))',
+}
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.external_id')
+    parser.add_argument('--rows', type=int, default=2_000_000)
+    parser.add_argument('--batch-size', type=int, default=10_000)
+    parser.add_argument(
+        '--database', choices=('sqlite', 'env'), default='sqlite'
+    )
+    return parser
+
+
+def get_table(metadata: sa.MetaData):
+    return sa.Table(
+        'bench_external_id',
+        metadata,
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column('external_id', GUID(binary=True), index=True),
+    )
+
+
+def run_strategy(engine, strategy: Strategy, rows: int, batch_size: int):
+    metadata = sa.MetaData()
+    table = get_table(metadata)
+    (index,) = table.indexes
+    metadata.drop_all(engine)
+    metadata.create_all(engine)
+    generate = GENERATORS[strategy]
+    throughputs = []
+    start = time.perf_counter()
+    with engine.connect() as conn:
+        for offset in range(0, rows, batch_size):
+            batch = [
+                {'external_id': generate()}
+                for _ in range(min(batch_size, rows - offset))
+            ]
+            batch_start = time.perf_counter()
+            with conn.begin():
+                conn.execute(sa.insert(table), batch)
+            throughputs.append(
+                len(batch) / (time.perf_counter() - batch_start)
+            )
+        elapsed = time.perf_counter() - start
+        index_size = conn.execute(
+            sa.text(INDEX_SIZE_QUERIES[engine.dialect.name]),
+            {'name': index.name},
+        ).scalar()
+    metadata.drop_all(engine)
+    # insert rate of the last tenth shows how it degrades as the index grows
+    tail = throughputs[-max(1, len(throughputs) // 10) :]
+    return {
+        'rows': rows,
+        'duration': round(elapsed, 3),
+        'throughput': round(rows / elapsed, 2),
+        'tail_throughput': round(sum(tail) / len(tail), 2),
+        'index_bytes': index_size,
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = get_parser().parse_args(argv)
+    tmpdir = None
+    if args.database == 'sqlite':
+        tmpdir = tempfile.mkdtemp(prefix='bench')
+        uri = f'sqlite:///{os.path.join(tmpdir, "bench.sqlite3")}'
+    else:
+        from src.core.settings import database_config
+
+        uri = database_config.get_uri(is_async=False)
+    engine = sa.create_engine(uri)
+    try:
+        results = {
+            strategy.value: run_strategy(
+                engine, strategy, args.rows, args.batch_size
+            )
+            for strategy in Strategy
+        }
+    finally:
+        engine.dispose()
+        if tmpdir is not None:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+    print(json.dumps({'database': engine.dialect.name, **results}, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,118 @@
+import asyncio
+import math
+import time
+from typing import Any, Iterator, Mapping, Sequence
+
+import httpx
+
+from benchmarks.scenarios import Scenario
+
+Result = dict[str, Any]
+
+# metrics where a higher value is an improvement,
+# every other compared metric is a latency
+HIGHER_IS_BETTER = frozenset(('throughput',))
+COMPARED_METRICS = ('throughput', 'p50', 'p95', 'p99')
+
+
+def percentile(timings: Sequence[float], rank: float) -> float:
+    """Nearest-rank percentile of already sorted :param:`timings`"""
+    if not timings:
+        return 0.0
+    index = max(0, math.ceil(rank / 100 * len(timings)) - 1)
+    return timings[index]
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    scenario: Scenario,
+    requests: int,
+    concurrency: int,
+    warmup: int = 0,
+) -> Result:
+    """Runs :param:`requests` operations of :param:`scenario` with
+    :param:`concurrency` clients issuing them back to back"""
+    for _ in range(warmup):
+        await scenario.next_operation()(client)
+
+    remaining = iter(range(requests))
+    timings: list[float] = []
+    statuses: dict[str, int] = {}
+
+    async def _worker():
+        for _ in remaining:
+            operation = scenario.next_operation()
+            start = time.perf_counter()
+            response = await operation(client)
+            timings.append(time.perf_counter() - start)
+            status = str(response.status_code)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(_worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    timings.sort()
+    errors = sum(
+        count
+        for status, count in statuses.items()
+        if not status.startswith('2')
+    )
+    result = {
+        'requests': len(timings),
+        'concurrency': concurrency,
+        'errors': errors,
+        'statuses': statuses,
+        'duration': round(elapsed, 4),
+        'throughput': round(len(timings) / elapsed, 2),
+        'p50': round(percentile(timings, 50) * 1000, 3),
+        'p95': round(percentile(timings, 95) * 1000, 3),
+        'p99': round(percentile(timings, 99) * 1000, 3),
+    }
+    result['error_rate'] = error_rate(result)
+    return result
+
+
+def error_rate(result: Result) -> float:
+    """Returns the share of failed requests of :param:`result`"""
+    if not result['requests']:
+        return 0.0
+    return round(result['errors'] / result['requests'], 4)
+
+
+def regression(metric: str, baseline: float, current: float) -> float:
+    """Returns how much worse :param:`current` is, in percent"""
+    if not baseline:
+        return 0.0
+    if metric in HIGHER_IS_BETTER:
+        return (baseline - current) / baseline * 100
+    return (current - baseline) / baseline * 100
+
+
+def compare(
+    results: Mapping[str, Result],
+    baseline: Mapping[str, Result],
+    max_regression: float,
+) -> Iterator[str]:
+    """Yields a message for every metric regressing past
+    :param:`max_regression` percent and for any error rate above the
+    baseline's, scenarios missing from the baseline are not compared
+    Obs: failing fast makes throughput and latency look better,
+    so errors are gated on their own"""
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        expected, current = error_rate(baseline[name]), error_rate(result)
+        if current > expected:
+            yield (
+                f'{name}.error_rate regressed: {expected} -> {current} '
+                f'({result["errors"]} of {result["requests"]} requests)'
+            )
+        for metric in COMPARED_METRICS:
+            worse_by = regression(
+                metric, baseline[name][metric], result[metric]
+            )
+            if worse_by > max_regression:
+                yield (
+                    f'{name}.{metric} regressed {worse_by:.1f}%: '
+                    f'{baseline[name][metric]} -> {result[metric]}'
+                )
@@ -0,0 +1,99 @@
+import itertools
+import random
+import uuid
+from typing import Awaitable, Callable, Sequence
+
+import httpx
+
+Operation = Callable[[httpx.AsyncClient], Awaitable[httpx.Response]]
+
+
+class Scenario:
+    """Weighted mix of operations, each call to `next_operation`
+    picks one of them with the configured probability"""
+
+    def __init__(
+        self,
+        name: str,
+        operations: Sequence[tuple[Operation, int]],
+        seed: int = 0,
+    ) -> None:
+        self.name = name
+        self._operations = [operation for operation, _ in operations]
+        self._weights = list(
+            itertools.accumulate(weight for _, weight in operations)
+        )
+        self._random = random.Random(seed)
+
+    def next_operation(self) -> Operation:
+        return self._random.choices(
+            self._operations, cum_weights=self._weights
+        )[0]
+
+
+def get_user(emails: Sequence[str], seed: int = 0) -> Operation:
+    choose = random.Random(seed).choice
+
+    def _get_user(client: httpx.AsyncClient):
+        return client.get(f'/users/{choose(emails)}')
+
+    return _get_user
+
+
+def list_users(limit: int = 50) -> Operation:
+    def _list_users(client: httpx.AsyncClient):
+        return client.get('/users/', params={'limit': limit})
+
+    return _list_users
+
+
+def create_user(password: str) -> Operation:
+    def _create_user(client: httpx.AsyncClient):
+        return client.post(
+            '/users/',
+            json={
+                'name': 'Bench',
+                'email': f'{uuid.uuid4().hex}@signup.bench',
+                'password': password,
+                'birthDate': '2000-01-01',
+            },
+        )
+
+    return _create_user
+
+
+def edit_user(emails: Sequence[str], seed: int = 0) -> Operation:
+    choose = random.Random(seed).choice
+    names = itertools.count()
+
+    def _edit_user(client: httpx.AsyncClient):
+        return client.patch(
+            f'/users/{choose(emails)}', json={'name': f'Bench {next(names)}'}
+        )
+
+    return _edit_user
+
+
+def get_scenarios(
+    emails: Sequence[str], password: str, hot_keys: int
+) -> dict[str, Scenario]:
+    """Default mixes, patch storms target only the first
+    :param:`hot_keys` users to exercise write contention"""
+    hot = emails[:hot_keys]
+    return {
+        scenario.name: scenario
+        for scenario in (
+            Scenario(
+                'read',
+                [(get_user(emails), 90), (list_users(), 10)],
+            ),
+            Scenario(
+                'signup',
+                [(create_user(password), 80), (get_user(emails), 20)],
+            ),
+            Scenario(
+                'patch',
+                [(edit_user(hot), 90), (get_user(hot), 10)],
+            ),
+        )
+    }
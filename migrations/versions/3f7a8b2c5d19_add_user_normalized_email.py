@@ -0,0 +1,81 @@
+"""add user normalized_email
+
+Revision ID: 3f7a8b2c5d19
+Revises: 9c4e1d2a7b13
+Create Date: 2026-10-17 11:03:27.540913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '3f7a8b2c5d19'
+down_revision = '9c4e1d2a7b13'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+
+def _backfill():
+    """Fills normalized_email in batches of :const:`BATCH_SIZE` rows
+    with the same normalization the application applies, each batch
+    commits on its own so no lock is held across the whole table and
+    a failed run resumes from the rows still unset
+    Obs: emails differing only by case or surrounding spaces make
+    the unique index creation fail and must be merged beforehand"""
+    conn = op.get_bind()
+    user = sa.table(
+        'user',
+        sa.column('id', sa.Integer),
+        sa.column('email', sa.String),
+        sa.column('normalized_email', sa.String),
+    )
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            sa.select(user.c.id, user.c.email)
+            .where(
+                user.c.id > last_id,
+                user.c.email.isnot(None),
+                user.c.normalized_email.is_(None),
+            )
+            .order_by(user.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        conn.execute(
+            user.update()
+            .where(user.c.id == sa.bindparam('row_id'))
+            .values(normalized_email=sa.bindparam('value')),
+            [
+                {'row_id': id_, 'value': email.strip().lower()}
+                for id_, email in rows
+            ],
+        )
+        last_id = rows[-1][0]
+
+
+def _has_column(table: str, column: str) -> bool:
+    columns = sa.inspect(op.get_bind()).get_columns(table)
+    return any(item['name'] == column for item in columns)
+
+
+def upgrade():
+    """Runs outside the migration transaction from the backfill on,
+    postgres builds the index concurrently so writes keep flowing
+    Obs: a failed concurrent build leaves an invalid index behind,
+    drop ix_user_normalized_email before running it again"""
+    if not _has_column('user', 'normalized_email'):
+        op.add_column('user', sa.Column('normalized_email', sa.String(length=255), nullable=True))
+    with op.get_context().autocommit_block():
+        _backfill()
+        op.create_index(op.f('ix_user_normalized_email'), 'user', ['normalized_email'], unique=True, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index(op.f('ix_user_normalized_email'), table_name='user', postgresql_concurrently=True)
+    with op.batch_alter_table('user') as batch_op:
+        batch_op.drop_column('normalized_email')
@@ -0,0 +1,93 @@
+"""store external_id as binary
+
+Revision ID: 9c4e1d2a7b13
+Revises: 5bed2746c45e
+Create Date: 2026-10-17 10:12:41.318204
+
+"""
+import uuid
+
+from alembic import op
+import sqlalchemy as sa
+import utils.guid
+
+# revision identifiers, used by Alembic.
+revision = '9c4e1d2a7b13'
+down_revision = '5bed2746c45e'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+
+def _convert(source, target, storage_types, convert):
+    """Copies every external_id from :param:`source` to :param:`target`
+    in batches of :const:`BATCH_SIZE` rows ordered by id
+    Obs: columns are read and written with their raw storage types,
+    :param:`convert` maps one representation into the other"""
+    conn = op.get_bind()
+    source_type, target_type = storage_types
+    user = sa.table(
+        'user',
+        sa.column('id', sa.Integer),
+        sa.column(source, source_type),
+        sa.column(target, target_type),
+    )
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            sa.select(user.c.id, user.c[source])
+            .where(user.c.id > last_id, user.c[source].isnot(None))
+            .order_by(user.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        conn.execute(
+            user.update()
+            .where(user.c.id == sa.bindparam('row_id'))
+            .values({target: sa.bindparam('value')}),
+            [{'row_id': id_, 'value': convert(value)} for id_, value in rows],
+        )
+        last_id = rows[-1][0]
+
+
+def _swap(old_type, new_type, convert):
+    # the dialect's own types, so mysql keeps BINARY(16) instead of a BLOB
+    dialect = op.get_bind().dialect
+    storage_types = (
+        old_type.load_dialect_impl(dialect),
+        new_type.load_dialect_impl(dialect),
+    )
+    op.add_column('user', sa.Column('external_id_new', new_type, nullable=True))
+    _convert('external_id', 'external_id_new', storage_types, convert)
+    op.drop_index(op.f('ix_user_external_id'), table_name='user')
+    with op.batch_alter_table('user') as batch_op:
+        batch_op.drop_column('external_id')
+        batch_op.alter_column(
+            'external_id_new',
+            new_column_name='external_id',
+            existing_type=storage_types[1],
+        )
+    op.create_index(op.f('ix_user_external_id'), 'user', ['external_id'], unique=False)
+
+
+def upgrade():
+    # postgres keeps its native uuid column
+    if op.get_bind().dialect.name == 'postgresql':
+        return
+    _swap(
+        utils.guid.GUID(length=32),
+        utils.guid.GUID(binary=True),
+        lambda value: uuid.UUID(hex=value).bytes,
+    )
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        return
+    _swap(
+        utils.guid.GUID(binary=True),
+        utils.guid.GUID(length=32),
+        lambda value: uuid.UUID(bytes=bytes(value)).hex,
+    )
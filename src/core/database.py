@@ -1,11 +1,40 @@
+import functools
+import importlib
+import logging
+import time
+
 import sqlalchemy as sa
 
-from src.core import settings
 from src.core.metadata import metadata
-from utils.finder import InstanceFinder
+
+# every module defining tables on `metadata`, so alembic imports
+# only these instead of walking the source tree
+TABLE_MODULES = ('src.users.table',)
+
+logger = logging.getLogger(__name__)
 
 
+@functools.cache
 def get_metadata():
-    finder = InstanceFinder(sa.Table, settings.ROOT)
-    finder.find()
+    """Imports :const:`TABLE_MODULES` and returns the metadata
+    Raises RuntimeError for tables defined in any other module,
+    which autogenerate would otherwise emit a drop_table for"""
+    start = time.perf_counter()
+    modules = [importlib.import_module(name) for name in TABLE_MODULES]
+    declared = {
+        value.key
+        for module in modules
+        for value in vars(module).values()
+        if isinstance(value, sa.Table)
+    }
+    if undeclared := sorted(set(metadata.tables) - declared):
+        raise RuntimeError(
+            f'Tables {", ".join(undeclared)} are defined outside of '
+            'TABLE_MODULES, add their modules to src.core.database'
+        )
+    logger.info(
+        'Loaded %d table modules in %.3fs',
+        len(modules),
+        time.perf_counter() - start,
+    )
     return metadata
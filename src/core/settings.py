@@ -1,11 +1,22 @@
 import pathlib
 
-from utils.config import Config
+from utils.config import Config, environ
 from utils.providers.database import DatabaseConfig
 
-config = Config()
-
 ROOT = pathlib.Path(__file__).resolve().parent.parent
 BASE_DIR = ROOT.parent
+ENV_FILE = BASE_DIR / '.env'
+
+config = Config(ENV_FILE)
 
+# the other provider configs are read in get_application,
+# so migrations only need the database params
 database_config = DatabaseConfig.from_env(config)
+
+
+def load_database_config() -> DatabaseConfig:
+    """Reads the database params again from :const:`ENV_FILE` and
+    the environment, file values win as the environment of a running
+    process cannot be changed from outside it"""
+    environ.reset(*DatabaseConfig.env_names())
+    return DatabaseConfig.from_env(Config(ENV_FILE, prefer_file=True))
@@ -1,21 +1,56 @@
 import fastapi
 
 from src.core import settings
+from src.core.database import get_metadata
 from src.routes import router
-from utils.events import create_event_handlers
-from utils.providers.database import setup_database
+from utils import exc
+from utils.events import Lifecycle
+from utils.handlers import handle_error
+from utils.metrics import MetricsMiddleware
+from utils.providers.cache import CacheConfig, setup_cache, teardown_cache
+from utils.providers.database import (
+    setup_database,
+    setup_database_reload,
+    teardown_database,
+    warm_up_database,
+)
+from utils.providers.external_id import ExternalIdConfig, setup_external_id
+from utils.providers.health import HealthConfig, setup_health, teardown_health
+from utils.providers.password import (
+    PasswordConfig,
+    setup_password,
+    teardown_password,
+)
+from utils.providers.rate_limit import RateLimitConfig, setup_rate_limit
+from utils.providers.token import TokenConfig, setup_token
 
 
 def get_application() -> fastapi.FastAPI:
     settings.config.raise_on_error()
     application = fastapi.FastAPI()
+    lifecycle = Lifecycle(application.state)
     application.include_router(router)
-    application.add_event_handler(
-        'startup',
-        create_event_handlers(
-            application.state, setup_database(settings.database_config)
-        ),
+    # fails at startup for tables alembic would not see
+    get_metadata()
+    application.add_middleware(MetricsMiddleware)
+    application.add_exception_handler(exc.APIError, handle_error)
+    application.add_exception_handler(exc.DatabaseError, handle_error)
+    lifecycle.on_startup(
+        setup_database(settings.database_config),
+        setup_password(PasswordConfig.from_env(settings.config)),
+        setup_cache(CacheConfig.from_env(settings.config)),
+        setup_external_id(ExternalIdConfig.from_env(settings.config)),
+        setup_token(TokenConfig.from_env(settings.config)),
+        setup_rate_limit(RateLimitConfig.from_env(settings.config)),
+    ).on_startup(
+        warm_up_database,
+        setup_database_reload(settings.load_database_config),
+        setup_health(HealthConfig.from_env(settings.config)),
     )
+    lifecycle.on_shutdown(
+        teardown_health, teardown_password, teardown_cache
+    ).on_shutdown(teardown_database)
+    lifecycle.install(application)
     return application
 
 
@@ -1,7 +1,12 @@
 import fastapi
+from fastapi.responses import JSONResponse, PlainTextResponse
 
 from src.users.routes import router as user_router
-from utils.providers import database
+from utils import events, metrics, singleflight
+from utils.providers import cache, database, health
+
+LIVENESS_PATH = '/health/live'
+READINESS_PATH = '/health/ready'
 
 router = fastapi.APIRouter()
 
@@ -13,5 +18,51 @@ async def healthcheck(
     database_provider: database.DatabaseProvider = fastapi.Depends(
         database.get_database_provider
     ),
+    cache_provider: cache.CacheProvider = fastapi.Depends(
+        cache.get_cache_provider
+    ),
+    health_probe: health.HealthProbe = fastapi.Depends(
+        health.get_health_probe
+    ),
+):
+    content = {
+        **health_probe.status(),
+        'pool': database_provider.pool_status(),
+        'cache': cache_provider.stats(),
+        'single_flight': singleflight.stats(),
+    }
+    return JSONResponse(
+        content, status_code=200 if health_probe.healthy else 503
+    )
+
+
+@router.get(LIVENESS_PATH)
+async def liveness():
+    return {'status': True}
+
+
+@router.get(READINESS_PATH)
+async def readiness(
+    lifecycle: events.Lifecycle = fastapi.Depends(events.get_lifecycle),
+    health_probe: health.HealthProbe = fastapi.Depends(
+        health.get_health_probe
+    ),
+):
+    if not lifecycle.ready:
+        return JSONResponse({'status': False}, status_code=503)
+    content = health_probe.status()
+    return JSONResponse(
+        content, status_code=200 if health_probe.healthy else 503
+    )
+
+
+@router.get('/metrics', response_class=PlainTextResponse)
+async def get_metrics(
+    cache_provider: cache.CacheProvider = fastapi.Depends(
+        cache.get_cache_provider
+    ),
 ):
-    return {'status': True, 'database': await database_provider.health_check()}
+    content = metrics.registry.render(
+        cache_provider.collect(), singleflight.collect()
+    )
+    return PlainTextResponse(content, media_type=metrics.CONTENT_TYPE)
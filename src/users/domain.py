@@ -1,67 +1,323 @@
+import typing
+
 from src.users import models, repository
-from utils import timezone
-from utils.providers import database, external_id, password
+from utils import exc, timezone
+from utils.model import dump_mapping, get_field_aliases
+from utils.pagination import decode_cursor, encode_cursor
+from utils.providers import cache, database, external_id, password, token
+
+READ_USER_ALIASES = get_field_aliases(models.ReadUser)
 
 
 def enclose(payload: models.User) -> models.ReadUser:
     return models.ReadUser.parse_obj(payload)
 
 
+def normalize_email(email: str) -> str:
+    return email.strip().lower()
+
+
+def cache_key(email: str) -> str:
+    return f'users:email:{normalize_email(email)}'
+
+
 class CreateUserUseCase:
     def __init__(
         self,
         database_provider: database.DatabaseProvider,
+        password_provider: password.PasswordProvider,
+        cache_provider: cache.CacheProvider,
         payload: models.CreateUser,
     ) -> None:
         self._database_provider = database_provider
-        self._payload = self._prepare_payload(payload)
+        self._password_provider = password_provider
+        self._cache_provider = cache_provider
+        self._payload = payload
 
-    def _prepare_payload(self, payload: models.CreateUser):
+    async def _prepare_payload(self, payload: models.CreateUser):
         return models.CreateUser(
             name=payload.name,
             email=payload.email,
-            password=password.hash(payload.password),
+            password=await self._password_provider.hash(payload.password),
             birth_date=payload.birth_date,
         )
 
     async def execute(self):
+        payload = await self._prepare_payload(self._payload)
         ext_id = external_id.generate()
         date_joined = timezone.now()
         result = await repository.UserRepository(
             self._database_provider
-        ).create(ext_id, date_joined, self._payload)
-        return enclose(result)
+        ).create(ext_id, date_joined, payload, normalize_email(payload.email))
+        user = enclose(result)
+        await self._cache_provider.invalidate(cache_key(user.email))
+        return user
 
 
 class RetrieveUserByEmailUseCase:
     def __init__(
         self,
         database_provider: database.DatabaseProvider,
+        cache_provider: cache.CacheProvider,
         email: str,
     ) -> None:
         self._database_provider = database_provider
+        self._cache_provider = cache_provider
         self._email = email
 
-    async def execute(self):
-        result = await repository.UserRepository(
+    async def execute(self) -> bytes:
+        """Returns the user already serialized as ReadUser json,
+        cached payloads are returned as they are"""
+        key = cache_key(self._email)
+        if (cached := await self._cache_provider.get(key)) is not None:
+            return cached
+        row = await repository.UserRepository(
             self._database_provider
-        ).retrieve('email', self._email)
-        return enclose(result)
+        ).retrieve_row('normalized_email', normalize_email(self._email))
+        payload = dump_mapping(READ_USER_ALIASES, row)
+        await self._cache_provider.fill(key, payload)
+        return payload
 
 
 class EditUserByEmailUseCase:
     def __init__(
         self,
         database_provider: database.DatabaseProvider,
+        password_provider: password.PasswordProvider,
+        cache_provider: cache.CacheProvider,
         email: str,
         payload: models.EditUser,
     ) -> None:
         self._database_provider = database_provider
+        self._password_provider = password_provider
+        self._cache_provider = cache_provider
         self._email = email
         self._payload = payload
 
+    async def _prepare_payload(self, payload: models.EditUser):
+        if payload.password is None:
+            return payload
+        return payload.copy(
+            update={
+                'password': await self._password_provider.hash(
+                    payload.password
+                )
+            }
+        )
+
     async def execute(self):
-        result = await repository.UserRepository(self._database_provider).edit(
-            self._email, self._payload
+        payload = await self._prepare_payload(self._payload)
+        async with self._database_provider.unit_of_work():
+            result = await repository.UserRepository(
+                self._database_provider
+            ).edit(
+                normalize_email(self._email),
+                payload,
+                payload.email and normalize_email(payload.email),
+            )
+        user = enclose(result)
+        await self._cache_provider.invalidate(
+            *{cache_key(self._email), cache_key(user.email)}
+        )
+        return user
+
+
+class AuthenticateUserUseCase:
+    def __init__(
+        self,
+        database_provider: database.DatabaseProvider,
+        password_provider: password.PasswordProvider,
+        email: str,
+        secret: str,
+    ) -> None:
+        self._database_provider = database_provider
+        self._password_provider = password_provider
+        self._email = email
+        self._secret = secret
+
+    async def execute(self) -> models.User:
+        user_repository = repository.UserRepository(self._database_provider)
+        try:
+            # replicas may lag behind a signup or a password change
+            user = await user_repository.retrieve_from_primary(
+                'normalized_email', normalize_email(self._email)
+            )
+        except exc.NotFoundError:
+            await self._password_provider.verify_dummy(self._secret)
+            raise exc.InvalidPassword() from None
+        is_valid, digest = await self._password_provider.verify_and_update(
+            self._secret, user.password
+        )
+        if not is_valid:
+            raise exc.InvalidPassword()
+        if digest is not None:
+            await user_repository.update_password(
+                user.id_, user.password, digest
+            )
+        return user
+
+
+class LoginUseCase:
+    def __init__(
+        self,
+        database_provider: database.DatabaseProvider,
+        password_provider: password.PasswordProvider,
+        token_provider: token.TokenProvider,
+        payload: models.Login,
+    ) -> None:
+        self._database_provider = database_provider
+        self._password_provider = password_provider
+        self._token_provider = token_provider
+        self._payload = payload
+
+    async def execute(self) -> models.Token:
+        user = await AuthenticateUserUseCase(
+            self._database_provider,
+            self._password_provider,
+            self._payload.email,
+            self._payload.password,
+        ).execute()
+        return models.Token(
+            access_token=self._token_provider.issue(
+                user.external_id, user.email
+            ),
+            expires_in=self._token_provider.ttl,
         )
-        return enclose(result)
+
+
+class CreateUsersInBulkUseCase:
+    def __init__(
+        self,
+        database_provider: database.DatabaseProvider,
+        password_provider: password.PasswordProvider,
+        cache_provider: cache.CacheProvider,
+        payloads: typing.Sequence[models.CreateUser],
+    ) -> None:
+        self._database_provider = database_provider
+        self._password_provider = password_provider
+        self._cache_provider = cache_provider
+        self._payloads = payloads
+
+    async def _prepare_values(
+        self, payloads: typing.Sequence[models.CreateUser]
+    ):
+        digests = await self._password_provider.hash_many(
+            [payload.password for payload in payloads]
+        )
+        date_joined = timezone.now()
+        return [
+            {
+                **payload.dict(),
+                'normalized_email': normalize_email(payload.email),
+                'password': digest,
+                'external_id': external_id.generate(),
+                'date_joined': date_joined,
+            }
+            for payload, digest in zip(payloads, digests)
+        ]
+
+    async def execute(self) -> list[models.BulkCreateResult]:
+        user_repository = repository.UserRepository(self._database_provider)
+        unique = dict[str, models.CreateUser]()
+        for payload in self._payloads:
+            unique.setdefault(normalize_email(payload.email), payload)
+        existing = await user_repository.find_emails(list(unique))
+        pending = [
+            payload
+            for email, payload in unique.items()
+            if email not in existing
+        ]
+        created = {
+            user.normalized_email: enclose(user)
+            for user in await user_repository.create_many(
+                await self._prepare_values(pending)
+            )
+        }
+        await self._cache_provider.invalidate(*map(cache_key, created))
+        return self._report(created)
+
+    def _report(self, created: dict[str, models.ReadUser]):
+        conflict = exc.ConflictError('user').response().message
+        results = []
+        for payload in self._payloads:
+            user = created.pop(normalize_email(payload.email), None)
+            if user is not None:
+                results.append(
+                    models.BulkCreateResult(
+                        email=payload.email, created=True, user=user
+                    )
+                )
+                continue
+            results.append(
+                models.BulkCreateResult(
+                    email=payload.email, created=False, error=conflict
+                )
+            )
+        return results
+
+
+class RetrieveUsersByEmailUseCase:
+    def __init__(
+        self,
+        database_provider: database.DatabaseProvider,
+        emails: typing.Sequence[str],
+    ) -> None:
+        self._database_provider = database_provider
+        self._emails = emails
+
+    async def execute(self) -> dict[str, models.ReadUser | None]:
+        emails = list(dict.fromkeys(self._emails))
+        found = {
+            user.normalized_email: enclose(user)
+            for user in await repository.UserRepository(
+                self._database_provider
+            ).retrieve_many(
+                'normalized_email',
+                list(dict.fromkeys(map(normalize_email, emails))),
+            )
+        }
+        return {email: found.get(normalize_email(email)) for email in emails}
+
+
+class ListUsersUseCase:
+    def __init__(
+        self,
+        database_provider: database.DatabaseProvider,
+        cursor: str | None,
+        limit: int,
+    ) -> None:
+        self._database_provider = database_provider
+        self._after = decode_cursor(cursor) if cursor else None
+        self._limit = limit
+
+    async def execute(self) -> models.UserPage:
+        rows = await repository.UserRepository(self._database_provider).page(
+            self._after, self._limit + 1
+        )
+        next_cursor = None
+        if len(rows) > self._limit:
+            rows = rows[: self._limit]
+            next_cursor = encode_cursor(rows[-1]['id'])
+        return models.UserPage(
+            items=[models.ReadUser.parse_obj(row) for row in rows],
+            next_cursor=next_cursor,
+        )
+
+
+class StreamUsersUseCase:
+    def __init__(
+        self,
+        database_provider: database.DatabaseProvider,
+        cursor: str | None,
+    ) -> None:
+        self._database_provider = database_provider
+        self._after = decode_cursor(cursor) if cursor else None
+
+    async def execute(self) -> typing.AsyncIterator[bytes]:
+        async for partition in repository.UserRepository(
+            self._database_provider
+        ).stream(self._after):
+            yield b''.join(
+                dump_mapping(READ_USER_ALIASES, row) + b'\n'
+                for row in partition
+            )
@@ -1,6 +1,7 @@
 from datetime import date, datetime
 from uuid import UUID
 
+from pydantic import conlist, validator
 from pydantic.networks import EmailStr
 
 from utils.model import Model, get_optional_model
@@ -11,6 +12,7 @@ class User(Model):
     external_id: UUID
     name: str
     email: str
+    normalized_email: str
     password: str
     birth_date: date
     date_joined: datetime
@@ -25,9 +27,56 @@ class CreateUser(Model):
 
 EditUser = get_optional_model(CreateUser)
 
+BULK_CREATE_MAX_SIZE = 5000
+
+BulkCreateUser = conlist(
+    CreateUser, min_items=1, max_items=BULK_CREATE_MAX_SIZE
+)
+
+LOOKUP_MAX_SIZE = 5000
+
 
 class ReadUser(Model):
     external_id: UUID
     name: str
     email: str
     birth_date: date
+
+
+class BulkCreateResult(Model):
+    email: str
+    created: bool
+    user: ReadUser | None = None
+    error: str | None = None
+
+
+class UserLookup(Model):
+    emails: conlist(str, min_items=1, max_items=LOOKUP_MAX_SIZE)
+
+    @validator('emails', each_item=True)
+    def _validate_email(cls, value: str):  # pylint: disable=no-self-argument
+        # validated as emails but kept as sent, results are keyed by them
+        EmailStr.validate(value)
+        return value
+
+
+class Login(Model):
+    email: EmailStr
+    password: str
+
+
+class Token(Model):
+    access_token: str
+    token_type: str = 'bearer'
+    expires_in: int
+
+
+class CurrentUser(Model):
+    external_id: UUID
+    email: str
+    expires_at: datetime
+
+
+class UserPage(Model):
+    items: list[ReadUser]
+    next_cursor: str | None = None
@@ -1,3 +1,4 @@
+import functools
 import typing
 from datetime import datetime
 from uuid import UUID
@@ -8,8 +9,66 @@ from sqlalchemy.exc import IntegrityError, NoResultFound
 from src.users import models
 from src.users.table import user_table
 from utils import exc
-from utils.helpers import on_error
-from utils.providers.database import ConnectionContext, DatabaseProvider
+from utils.helpers import chunked, on_error
+from utils.providers.database import (
+    ConnectionContext,
+    DatabaseProvider,
+    supports_returning,
+)
+from utils.singleflight import single_flight
+
+Row = typing.Mapping[str, typing.Any]
+
+BULK_CHUNK_SIZE = 100
+LOOKUP_CHUNK_SIZE = 500
+STREAM_PARTITION_SIZE = 1000
+
+READ_COLUMNS = (
+    user_table.c.id,
+    user_table.c.external_id,
+    user_table.c.name,
+    user_table.c.email,
+    user_table.c.birth_date,
+)
+
+# statements are built once with bind parameters, so their cache keys
+# are memoized and every execution hits the compiled statement cache
+INSERT_USER = sa.insert(user_table)
+UPDATE_USER_BY_EMAIL = sa.update(user_table).where(
+    user_table.c.normalized_email == sa.bindparam('where_email')
+)
+INSERT_USER_RETURNING = INSERT_USER.returning(*user_table.c)
+UPDATE_USER_BY_EMAIL_RETURNING = UPDATE_USER_BY_EMAIL.returning(*user_table.c)
+# compare and swap, a concurrent password change wins over a rehash
+UPDATE_PASSWORD = sa.update(user_table).where(
+    user_table.c.id == sa.bindparam('user_id'),
+    user_table.c.password == sa.bindparam('old_digest'),
+)
+SELECT_EMAILS = sa.select(user_table.c.normalized_email).where(
+    user_table.c.normalized_email.in_(sa.bindparam('values', expanding=True))
+)
+LIST_USERS = sa.select(*READ_COLUMNS).order_by(user_table.c.id)
+LIST_USERS_AFTER = LIST_USERS.where(user_table.c.id > sa.bindparam('after'))
+PAGE_USERS = LIST_USERS.limit(sa.bindparam('limit'))
+PAGE_USERS_AFTER = LIST_USERS_AFTER.limit(sa.bindparam('limit'))
+
+
+@functools.cache
+def select_by(field: str, columns: tuple = ()):
+    """Returns the select of :param:`columns`, or every column,
+    filtered by :param:`field` equal to the `value` parameter"""
+    return sa.select(*columns or user_table.c).where(
+        getattr(user_table.c, field) == sa.bindparam('value')
+    )
+
+
+@functools.cache
+def select_in(field: str):
+    return sa.select(user_table).where(
+        getattr(user_table.c, field).in_(
+            sa.bindparam('values', expanding=True)
+        )
+    )
 
 
 class UserRepository:
@@ -25,43 +84,183 @@ class UserRepository:
         external_id: UUID,
         date_joined: datetime,
         payload: models.CreateUser,
+        normalized_email: str,
     ):
-        query = sa.insert(user_table).values(
-            {
-                'external_id': external_id,
-                'date_joined': date_joined,
-                **payload.dict(),
-            }
+        values = {
+            'external_id': external_id,
+            'date_joined': date_joined,
+            'normalized_email': normalized_email,
+            **payload.dict(),
+        }
+        async with self._provider.acquire().begin() as conn:
+            if supports_returning(conn.dialect):
+                result = await conn.execute(INSERT_USER_RETURNING, values)
+            else:
+                await conn.execute(INSERT_USER, values)
+                result = await conn.execute(
+                    select_by('external_id'), {'value': external_id}
+                )
+            user = self.serialize(result.mappings().one())
+        self._provider.record_write(('normalized_email', normalized_email))
+        return user
+
+    async def create_many(
+        self, values: typing.Sequence[typing.Mapping[str, typing.Any]]
+    ) -> list[models.User]:
+        """Inserts :param:`values` in multi-row chunks and returns the
+        created users, rows conflicting with existing users are skipped"""
+        created = []
+        async with self._provider.acquire().begin() as conn:
+            for chunk in chunked(values, BULK_CHUNK_SIZE):
+                query = self._provider.insert_ignoring_conflicts(
+                    user_table
+                ).values(chunk)
+                if supports_returning(conn.dialect):
+                    result = await conn.execute(query.returning(*user_table.c))
+                else:
+                    await conn.execute(query)
+                    result = await conn.execute(
+                        select_in('external_id'),
+                        {'values': [item['external_id'] for item in chunk]},
+                    )
+                created.extend(map(self.serialize, result.mappings()))
+        self._provider.record_write(
+            *(('normalized_email', user.normalized_email) for user in created)
+        )
+        return created
+
+    async def find_emails(self, emails: typing.Sequence[str]) -> set[str]:
+        """Returns which of the normalized :param:`emails` exist"""
+        found = set[str]()
+        async with self._provider.acquire(readonly=True) as conn:
+            for chunk in chunked(emails, LOOKUP_CHUNK_SIZE):
+                result = await conn.execute(SELECT_EMAILS, {'values': chunk})
+                found.update(result.scalars())
+        return found
+
+    @on_error(NoResultFound, exc.NotFoundError, target='user')
+    @single_flight(
+        key=lambda self, field, value: (
+            field,
+            value,
+            self._provider.is_pinned((field, value)),
+        )
+    )
+    async def retrieve(self, field: str, value: typing.Any):
+        context = self._provider.acquire(
+            readonly=True, consistency_key=(field, value)
+        )
+        async with context:
+            return await self._get(context, field, value)
+
+    @on_error(NoResultFound, exc.NotFoundError, target='user')
+    @single_flight(
+        key=lambda self, field, value: (
+            field,
+            value,
+            self._provider.is_pinned((field, value)),
         )
-        async with self._provider.acquire() as conn:
-            async with conn.begin():
-                await conn.execute(query)
+    )
+    async def retrieve_row(self, field: str, value: typing.Any) -> Row:
+        """Same lookup as `retrieve`, but returns the raw
+        :const:`READ_COLUMNS` mapping without building a model"""
+        async with self._provider.acquire(
+            readonly=True, consistency_key=(field, value)
+        ) as conn:
             result = await conn.execute(
-                sa.select(user_table).where(
-                    user_table.c.external_id == external_id
-                )
+                select_by(field, READ_COLUMNS), {'value': value}
             )
-            return self.serialize(result.mappings().one())
+            return result.mappings().one()
 
     @on_error(NoResultFound, exc.NotFoundError, target='user')
-    async def retrieve(self, field: str, value: typing.Any):
+    async def retrieve_from_primary(self, field: str, value: typing.Any):
+        """Same lookup as `retrieve` on the primary and never shared,
+        for reads that must see the latest committed write"""
         context = self._provider.acquire()
         async with context:
             return await self._get(context, field, value)
 
+    async def retrieve_many(
+        self, field: str, values: typing.Sequence[typing.Any]
+    ) -> list[models.User]:
+        users = []
+        async with self._provider.acquire(readonly=True) as conn:
+            for chunk in chunked(values, LOOKUP_CHUNK_SIZE):
+                result = await conn.execute(
+                    select_in(field), {'values': chunk}
+                )
+                users.extend(map(self.serialize, result.mappings()))
+        return users
+
+    async def page(self, after: int | None, limit: int) -> list[Row]:
+        query, params = PAGE_USERS, {'limit': limit}
+        if after is not None:
+            query, params = PAGE_USERS_AFTER, {**params, 'after': after}
+        async with self._provider.acquire(readonly=True) as conn:
+            result = await conn.execute(query, params)
+            return list(result.mappings())
+
+    async def stream(
+        self, after: int | None
+    ) -> typing.AsyncIterator[typing.Sequence[Row]]:
+        """Yields rows in partitions read from a server side cursor"""
+        async with self._provider.acquire(readonly=True) as conn:
+            if after is None:
+                result = await conn.stream(LIST_USERS)
+            else:
+                result = await conn.stream(LIST_USERS_AFTER, {'after': after})
+            async for partition in result.mappings().partitions(
+                STREAM_PARTITION_SIZE
+            ):
+                yield partition
+
     @on_error(NoResultFound, exc.NotFoundError, target='user')
     @on_error(IntegrityError, exc.ConflictError, target='user')
-    async def edit(self, email: str, payload: models.EditUser):
-        context = self._provider.acquire()
-        update_query = (
-            sa.update(user_table)
-            .where(user_table.c.email == email)
-            .values(payload.dict(exclude_none=True))
+    async def edit(
+        self,
+        normalized_email: str,
+        payload: models.EditUser,
+        new_normalized_email: str | None = None,
+    ):
+        values = payload.dict(exclude_none=True)
+        if not values:
+            return await self.retrieve('normalized_email', normalized_email)
+        if new_normalized_email is not None:
+            values['normalized_email'] = new_normalized_email
+        # the SET clause follows the parameter keys, each combination
+        # of edited fields gets its own compiled cache entry
+        params = {**values, 'where_email': normalized_email}
+        async with self._provider.acquire().begin() as conn:
+            if supports_returning(conn.dialect, 'update'):
+                result = await conn.execute(
+                    UPDATE_USER_BY_EMAIL_RETURNING, params
+                )
+            else:
+                result = await conn.execute(UPDATE_USER_BY_EMAIL, params)
+                if not result.rowcount:
+                    raise NoResultFound()
+                result = await conn.execute(
+                    select_by('normalized_email'),
+                    {'value': new_normalized_email or normalized_email},
+                )
+            user = self.serialize(result.mappings().one())
+        self._provider.record_write(
+            ('normalized_email', normalized_email),
+            ('normalized_email', user.normalized_email),
         )
-        async with context as conn:
-            await self._get(context, 'email', email)
-            await conn.execute(update_query)
-        return await self._get(context, 'email', payload.email or email)
+        return user
+
+    async def update_password(
+        self, id_: int, old_digest: str, digest: str
+    ) -> bool:
+        """Replaces :param:`old_digest` with :param:`digest`, returns
+        False if the password changed since old_digest was read"""
+        async with self._provider.acquire().begin() as conn:
+            result = await conn.execute(
+                UPDATE_PASSWORD,
+                {'user_id': id_, 'old_digest': old_digest, 'password': digest},
+            )
+        return bool(result.rowcount)
 
     async def _get(
         self,
@@ -69,9 +268,6 @@ class UserRepository:
         field: str,
         value: typing.Any,
     ):
-        query = sa.select(user_table).where(
-            getattr(user_table.c, field) == value
-        )
         async with connection_context as conn:
-            result = await conn.execute(query)
+            result = await conn.execute(select_by(field), {'value': value})
             return self.serialize(result.mappings().one())
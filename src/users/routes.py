@@ -1,42 +1,167 @@
+from datetime import datetime, timezone
+
 import fastapi
+from fastapi.responses import StreamingResponse
 from pydantic.networks import EmailStr
 
 from src.users import domain, models
-from utils.providers import database
+from utils.providers import cache, database, password, rate_limit, token
 
 router = fastapi.APIRouter()
 
 
+@router.get('/', response_model=models.UserPage)
+async def list_users(
+    cursor: str | None = fastapi.Query(None),
+    limit: int = fastapi.Query(50, ge=1, le=500),
+    stream: bool = fastapi.Query(False),
+    database_provider: database.DatabaseProvider = fastapi.Depends(
+        database.get_database_provider
+    ),
+):
+    if stream:
+        return StreamingResponse(
+            domain.StreamUsersUseCase(database_provider, cursor).execute(),
+            media_type='application/x-ndjson',
+        )
+    return await domain.ListUsersUseCase(
+        database_provider, cursor, limit
+    ).execute()
+
+
+@router.get('/me', response_model=models.CurrentUser)
+async def get_current_user(
+    claims: token.TokenClaims = fastapi.Depends(token.get_current_user),
+):
+    return models.CurrentUser(
+        external_id=claims.sub,
+        email=claims.email,
+        expires_at=datetime.fromtimestamp(claims.exp, tz=timezone.utc),
+    )
+
+
 @router.get('/{email}', response_model=models.ReadUser)
 async def get_user(
     email: EmailStr = fastapi.Path(...),
     database_provider: database.DatabaseProvider = fastapi.Depends(
         database.get_database_provider
     ),
+    cache_provider: cache.CacheProvider = fastapi.Depends(
+        cache.get_cache_provider
+    ),
 ):
-    return await domain.RetrieveUserByEmailUseCase(
-        database_provider, email
-    ).execute()
+    # response_model only documents the payload,
+    # which is already validated and rendered by the use case
+    return fastapi.Response(
+        await domain.RetrieveUserByEmailUseCase(
+            database_provider, cache_provider, email
+        ).execute(),
+        media_type='application/json',
+    )
 
 
 @router.post('/', response_model=models.ReadUser)
 async def create_user(
+    request: fastapi.Request,
     payload: models.CreateUser = fastapi.Body(...),
     database_provider: database.DatabaseProvider = fastapi.Depends(
         database.get_database_provider
     ),
+    password_provider: password.PasswordProvider = fastapi.Depends(
+        password.get_password_provider
+    ),
+    cache_provider: cache.CacheProvider = fastapi.Depends(
+        cache.get_cache_provider
+    ),
+    rate_limiter: rate_limit.RateLimiter = fastapi.Depends(
+        rate_limit.get_rate_limiter
+    ),
 ):
-    return await domain.CreateUserUseCase(database_provider, payload).execute()
+    rate_limiter.check(request, domain.normalize_email(payload.email))
+    return await domain.CreateUserUseCase(
+        database_provider, password_provider, cache_provider, payload
+    ).execute()
+
+
+@router.post('/login', response_model=models.Token)
+async def login(
+    request: fastapi.Request,
+    payload: models.Login = fastapi.Body(...),
+    database_provider: database.DatabaseProvider = fastapi.Depends(
+        database.get_database_provider
+    ),
+    password_provider: password.PasswordProvider = fastapi.Depends(
+        password.get_password_provider
+    ),
+    token_provider: token.TokenProvider = fastapi.Depends(
+        token.get_token_provider
+    ),
+    rate_limiter: rate_limit.RateLimiter = fastapi.Depends(
+        rate_limit.get_rate_limiter
+    ),
+):
+    rate_limiter.check(request, domain.normalize_email(payload.email))
+    return await domain.LoginUseCase(
+        database_provider, password_provider, token_provider, payload
+    ).execute()
+
+
+@router.post('/bulk', response_model=list[models.BulkCreateResult])
+async def create_users_in_bulk(
+    request: fastapi.Request,
+    payload: models.BulkCreateUser = fastapi.Body(...),
+    database_provider: database.DatabaseProvider = fastapi.Depends(
+        database.get_database_provider
+    ),
+    password_provider: password.PasswordProvider = fastapi.Depends(
+        password.get_password_provider
+    ),
+    cache_provider: cache.CacheProvider = fastapi.Depends(
+        cache.get_cache_provider
+    ),
+    rate_limiter: rate_limit.RateLimiter = fastapi.Depends(
+        rate_limit.get_rate_limiter
+    ),
+):
+    # every row costs one hash, so every row costs one token
+    rate_limiter.check_bulk(request, len(payload))
+    return await domain.CreateUsersInBulkUseCase(
+        database_provider, password_provider, cache_provider, payload
+    ).execute()
+
+
+@router.post('/lookup', response_model=dict[str, models.ReadUser | None])
+async def lookup_users(
+    payload: models.UserLookup = fastapi.Body(...),
+    database_provider: database.DatabaseProvider = fastapi.Depends(
+        database.get_database_provider
+    ),
+):
+    return await domain.RetrieveUsersByEmailUseCase(
+        database_provider, payload.emails
+    ).execute()
 
 
 @router.patch('/{email}', response_model=models.ReadUser)
 async def update_user(
+    request: fastapi.Request,
     email: EmailStr = fastapi.Path(...),
     payload: models.EditUser = fastapi.Body(...),
     database_provider: database.DatabaseProvider = fastapi.Depends(
         database.get_database_provider
     ),
+    password_provider: password.PasswordProvider = fastapi.Depends(
+        password.get_password_provider
+    ),
+    cache_provider: cache.CacheProvider = fastapi.Depends(
+        cache.get_cache_provider
+    ),
+    rate_limiter: rate_limit.RateLimiter = fastapi.Depends(
+        rate_limit.get_rate_limiter
+    ),
 ):
+    if payload.password is not None:
+        rate_limiter.check(request, domain.normalize_email(email))
     return await domain.EditUserByEmailUseCase(
-        database_provider, email, payload
+        database_provider, password_provider, cache_provider, email, payload
     ).execute()
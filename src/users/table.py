@@ -7,9 +7,10 @@ user_table = sa.Table(
     'user',
     metadata,
     sa.Column('id', sa.Integer, primary_key=True),
-    sa.Column('external_id', GUID(), index=True),
+    sa.Column('external_id', GUID(binary=True), index=True),
     sa.Column('name', sa.String(50)),
     sa.Column('email', sa.String(255), unique=True),
+    sa.Column('normalized_email', sa.String(255), unique=True, index=True),
     sa.Column('password', sa.String(255)),
     sa.Column('birth_date', sa.Date),
     sa.Column('date_joined', sa.TIMESTAMP(timezone=True)),
@@ -0,0 +1,74 @@
+import asyncio
+import atexit
+import os
+import pathlib
+import shutil
+import tempfile
+
+import pytest
+import sqlalchemy as sa
+
+TMP_DIR = pathlib.Path(tempfile.mkdtemp(prefix='tests'))
+DATABASE = TMP_DIR / 'test.sqlite3'
+REPLICA = TMP_DIR / 'replica.sqlite3'
+atexit.register(shutil.rmtree, TMP_DIR, ignore_errors=True)
+
+# set before src is imported, tests never touch a configured database
+os.environ['DB_DRIVER'] = 'sqlite'
+os.environ['DB_HOST'] = str(DATABASE)
+os.environ['DB_REPLICA_HOSTS'] = ''
+os.environ.setdefault('TOKEN_SECRET_KEYS', 'test:secret')
+os.environ.setdefault('RATE_LIMIT_ENABLED', 'false')
+os.environ.setdefault('PASSWORD_TIME_COST', '1')
+os.environ.setdefault('PASSWORD_MEMORY_COST', '8192')
+
+
+def reset_database():
+    """Empties the primary and a replica that never receives writes,
+    which stands in for one lagging behind"""
+    from src.core.database import get_metadata
+
+    metadata = get_metadata()
+    for path in (DATABASE, REPLICA):
+        engine = sa.create_engine(f'sqlite:///{path}')
+        metadata.drop_all(engine)
+        metadata.create_all(engine)
+        engine.dispose()
+
+
+def get_replicated_provider():
+    """Returns a provider reading from the lagging :const:`REPLICA`"""
+    from src.core import settings
+    from utils.providers.database import DatabaseProvider
+
+    return DatabaseProvider(
+        settings.database_config.copy(update={'replica_hosts': str(REPLICA)})
+    )
+
+
+@pytest.fixture
+def run_app():
+    """Runs `test(app, client)` with the application started on an
+    empty database, returning what it returns"""
+    import httpx
+
+    from src.main import get_application
+
+    reset_database()
+
+    def run(test):
+        async def main():
+            app = get_application()
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(
+                transport=transport, base_url='http://test'
+            ) as client:
+                await app.router.startup()
+                try:
+                    return await test(app, client)
+                finally:
+                    await app.router.shutdown()
+
+        return asyncio.run(main())
+
+    return run
@@ -0,0 +1,139 @@
+import asyncio
+import time
+
+from utils.providers.cache import (
+    Backend,
+    CacheConfig,
+    CacheProvider,
+    SharedBackend,
+)
+
+
+class StandInClient:
+    """Local stand-in for redis.asyncio, with the get/set/delete
+    subset SharedBackend uses, shared like a server between workers"""
+
+    def __init__(self) -> None:
+        self.items: dict[str, tuple[float, bytes]] = {}
+
+    async def get(self, key: str) -> bytes | None:
+        item = self.items.get(key)
+        if item is None or item[0] <= time.monotonic():
+            return None
+        return item[1]
+
+    async def set(self, key: str, value: bytes, ex: int, nx: bool = False):
+        if nx and await self.get(key) is not None:
+            return None
+        self.items[key] = (time.monotonic() + ex, value)
+        return True
+
+    async def delete(self, *keys: str) -> int:
+        return sum(self.items.pop(key, None) is not None for key in keys)
+
+    async def close(self) -> None:
+        return None
+
+
+def get_worker(client: StandInClient, **kwargs) -> CacheProvider:
+    config = CacheConfig(backend=Backend.SHARED, **kwargs)
+    return CacheProvider(config, SharedBackend(client, config.ttl))
+
+
+def test_cache_is_off_by_default():
+    assert CacheConfig().backend is Backend.NONE
+
+
+def test_fill_is_shared_between_workers():
+    client = StandInClient()
+    first, second = get_worker(client), get_worker(client)
+
+    async def main():
+        await first.fill('key', b'value')
+        return await second.get('key')
+
+    assert asyncio.run(main()) == b'value'
+    assert client.items['key'][0] - time.monotonic() > 59
+
+
+def test_fill_does_not_overwrite():
+    worker = get_worker(StandInClient())
+
+    async def main():
+        await worker.fill('key', b'first')
+        await worker.fill('key', b'second')
+        return await worker.get('key')
+
+    assert asyncio.run(main()) == b'first'
+
+
+def test_invalidate_reaches_every_worker():
+    client = StandInClient()
+    writer, reader = get_worker(client), get_worker(client)
+
+    async def main():
+        await reader.fill('key', b'old')
+        await writer.invalidate('key')
+        return await reader.get('key')
+
+    assert asyncio.run(main()) is None
+    assert reader.stats()['misses'] == 1
+
+
+def test_read_started_before_a_write_is_not_cached():
+    client = StandInClient()
+    writer, reader = get_worker(client), get_worker(client)
+
+    async def main():
+        assert await reader.get('key') is None
+        # the reader fetched the old row, then the write committed
+        await writer.invalidate('key')
+        await reader.fill('key', b'old')
+        return await reader.get('key')
+
+    assert asyncio.run(main()) is None
+
+
+def test_key_can_be_filled_after_the_lease():
+    client = StandInClient()
+    worker = get_worker(client, lease=1)
+
+    async def main():
+        await worker.invalidate('key')
+        expires_at, value = client.items['key']
+        client.items['key'] = (time.monotonic() - 1, value)
+        await worker.fill('key', b'new')
+        return await worker.get('key')
+
+    assert asyncio.run(main()) == b'new'
+
+
+def test_backend_errors_are_a_miss():
+    class BrokenClient(StandInClient):
+        async def get(self, key: str):
+            raise ConnectionError
+
+    worker = get_worker(BrokenClient())
+    assert asyncio.run(worker.get('key')) is None
+
+
+def test_edit_invalidates_the_cached_profile(run_app, monkeypatch):
+    monkeypatch.setenv('CACHE_BACKEND', 'memory')
+    monkeypatch.setenv('CACHE_LEASE', '0')
+    payload = {
+        'name': 'User',
+        'email': 'user@example.com',
+        'password': 'secret',
+        'birthDate': '2000-01-01',
+    }
+
+    async def test(app, client):
+        await client.post('/users/', json=payload)
+        await client.get('/users/user@example.com')
+        await client.get('/users/user@example.com')
+        assert app.state.cache_provider.stats()['hits'] == 1
+        await client.patch('/users/user@example.com', json={'name': 'New'})
+        response = await client.get('/users/user@example.com')
+        assert response.json()['name'] == 'New'
+
+    run_app(test)
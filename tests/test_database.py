@@ -0,0 +1,92 @@
+import asyncio
+import pathlib
+
+import pytest
+import sqlalchemy as sa
+from sqlalchemy.ext import asyncio as async_sa
+
+from utils.providers.database import ConnectionContext
+
+items = sa.Table(
+    'items', sa.MetaData(), sa.Column('id', sa.Integer, primary_key=True)
+)
+
+
+def run(tmp_path: pathlib.Path, test):
+    async def main():
+        engine = async_sa.create_async_engine(
+            f'sqlite+aiosqlite:///{tmp_path / "test.sqlite3"}'
+        )
+        async with engine.begin() as conn:
+            await conn.run_sync(items.metadata.create_all)
+        try:
+            return await test(engine)
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(main())
+
+
+async def count(engine: async_sa.AsyncEngine) -> int:
+    async with engine.connect() as conn:
+        result = await conn.execute(
+            sa.select(sa.func.count()).select_from(items)
+        )
+        return result.scalar_one()
+
+
+def test_nested_blocks_share_the_connection(tmp_path):
+    async def test(engine):
+        context = ConnectionContext(engine.connect)
+        async with context as outer:
+            async with context as inner:
+                assert inner is outer
+            assert not outer.closed
+        assert outer.closed
+
+    run(tmp_path, test)
+
+
+def test_nested_begin_joins_the_outer_transaction(tmp_path):
+    async def test(engine):
+        context = ConnectionContext(engine.connect)
+        async with context.begin() as outer:
+            await outer.execute(sa.insert(items), {'id': 1})
+            async with context.begin() as inner:
+                assert inner is outer
+                await inner.execute(sa.insert(items), {'id': 2})
+            # the inner block did not commit
+            assert await count(engine) == 0
+        assert await count(engine) == 2
+
+    run(tmp_path, test)
+
+
+def test_error_in_nested_begin_rolls_back_everything(tmp_path):
+    async def test(engine):
+        context = ConnectionContext(engine.connect)
+        with pytest.raises(LookupError):
+            async with context.begin() as outer:
+                await outer.execute(sa.insert(items), {'id': 1})
+                async with context.begin() as inner:
+                    await inner.execute(sa.insert(items), {'id': 2})
+                    raise LookupError
+        assert await count(engine) == 0
+        # the context is usable again after the rollback
+        async with context.begin() as conn:
+            await conn.execute(sa.insert(items), {'id': 3})
+        assert await count(engine) == 1
+
+    run(tmp_path, test)
+
+
+def test_begin_after_a_read_commits(tmp_path):
+    async def test(engine):
+        context = ConnectionContext(engine.connect)
+        async with context as conn:
+            await conn.execute(sa.select(items))
+            async with context.begin() as inner:
+                await inner.execute(sa.insert(items), {'id': 1})
+            assert await count(engine) == 1
+
+    run(tmp_path, test)
@@ -0,0 +1,56 @@
+import threading
+import time
+
+from utils.providers import external_id
+
+
+def test_uuid7_version_and_variant():
+    value = external_id.uuid7()
+    assert value.version == 7
+    assert value.variant == 'specified in RFC 4122'
+
+
+def test_uuid7_is_monotonic_within_a_millisecond(monkeypatch):
+    monkeypatch.setattr(time, 'time_ns', lambda: 1_700_000_000_000_000_000)
+    values = [external_id.uuid7() for _ in range(5000)]
+    assert values == sorted(values)
+    assert len(set(values)) == len(values)
+
+
+def test_uuid7_is_monotonic_when_the_clock_moves_back(monkeypatch):
+    now = [1_700_000_000_000_000_000]
+    monkeypatch.setattr(time, 'time_ns', lambda: now[0])
+    before = external_id.uuid7()
+    now[0] -= 5_000_000
+    assert external_id.uuid7() > before
+
+
+def test_uuid7_is_monotonic_across_threads():
+    results: list[list] = [[] for _ in range(4)]
+
+    def generate(output: list):
+        for _ in range(2000):
+            output.append(external_id.uuid7())
+
+    threads = [
+        threading.Thread(target=generate, args=(output,)) for output in results
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    values = [value for output in results for value in output]
+    assert len(set(values)) == len(values)
+    for output in results:
+        assert output == sorted(output)
+
+
+def test_configure_selects_the_generator():
+    external_id.configure(
+        external_id.ExternalIdConfig(strategy=external_id.Strategy.RANDOM)
+    )
+    try:
+        assert external_id.generate().version == 4
+    finally:
+        external_id.configure(external_id.ExternalIdConfig())
+    assert external_id.generate().version == 7
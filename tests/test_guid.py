@@ -0,0 +1,58 @@
+import uuid
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+
+from utils.guid import GUID
+
+VALUE = uuid.UUID('0190a5e2-7c1b-7d4e-8f00-123456789abc')
+
+
+def test_binary_guid_round_trips_through_sqlite():
+    table = sa.Table(
+        'items',
+        sa.MetaData(),
+        sa.Column('binary', GUID(binary=True)),
+        sa.Column('hex', GUID()),
+    )
+    engine = sa.create_engine('sqlite://')
+    table.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(
+            table.insert(),
+            [
+                {'binary': VALUE, 'hex': str(VALUE)},
+                {'binary': None, 'hex': None},
+            ],
+        )
+        stored = conn.execute(
+            sa.select(sa.cast(table.c.binary, sa.LargeBinary))
+        ).scalars()
+        assert list(stored) == [VALUE.bytes, None]
+        rows = conn.execute(sa.select(table)).all()
+    engine.dispose()
+    assert rows == [(VALUE, VALUE), (None, None)]
+
+
+def test_bind_param_per_mode():
+    assert (
+        GUID(binary=True).process_bind_param(str(VALUE), sqlite.dialect())
+        == VALUE.bytes
+    )
+    assert GUID().process_bind_param(VALUE, sqlite.dialect()) == VALUE.hex
+    assert GUID(binary=True).process_bind_param(
+        VALUE, postgresql.dialect()
+    ) == str(VALUE)
+
+
+def test_dialect_storage_types():
+    binary = GUID(binary=True)
+    assert isinstance(binary.load_dialect_impl(mysql.dialect()), mysql.BINARY)
+    assert binary.load_dialect_impl(mysql.dialect()).length == 16
+    assert isinstance(
+        binary.load_dialect_impl(sqlite.dialect()), sa.LargeBinary
+    )
+    assert isinstance(
+        binary.load_dialect_impl(postgresql.dialect()), postgresql.UUID
+    )
+    assert GUID().load_dialect_impl(sqlite.dialect()).length == 32
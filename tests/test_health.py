@@ -0,0 +1,70 @@
+import asyncio
+
+from starlette.datastructures import State
+
+from utils import exc
+from utils.providers.health import HealthConfig, HealthProbe
+
+
+class StubProvider:
+    def __init__(self, up: bool = True) -> None:
+        self.up = up
+
+    async def health_check(self):
+        if not self.up:
+            raise exc.DatabaseError('database')
+        return True
+
+    def replica_status(self):
+        return {}
+
+
+def get_probe(provider: StubProvider, **kwargs) -> HealthProbe:
+    state = State()
+    state.database_provider = provider
+    return HealthProbe(state, HealthConfig(**kwargs))
+
+
+def test_unprobed_is_unhealthy():
+    probe = get_probe(StubProvider())
+    assert not probe.healthy
+    assert probe.status()['age'] is None
+
+
+def test_fresh_probe_is_healthy():
+    probe = get_probe(StubProvider())
+    asyncio.run(probe.probe())
+    assert probe.healthy
+
+
+def test_stale_probe_is_unhealthy():
+    probe = get_probe(StubProvider(), stale_after=0)
+    asyncio.run(probe.probe())
+    assert probe.status()['database']
+    assert not probe.healthy
+
+
+def test_failed_database_check_is_unhealthy():
+    provider = StubProvider()
+    probe = get_probe(provider)
+    asyncio.run(probe.probe())
+    provider.up = False
+    asyncio.run(probe.probe())
+    assert not probe.healthy
+    assert not probe.status()['database']
+
+
+def test_health_check_reports_a_stale_probe(run_app, monkeypatch):
+    monkeypatch.setenv('HEALTH_STALE_AFTER', '0')
+
+    async def test(app, client):
+        return (await client.get('/health-check')).status_code
+
+    assert run_app(test) == 503
+
+
+def test_health_check_reports_a_fresh_probe(run_app):
+    async def test(app, client):
+        return (await client.get('/health-check')).status_code
+
+    assert run_app(test) == 200
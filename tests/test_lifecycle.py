@@ -0,0 +1,79 @@
+import asyncio
+
+from starlette.datastructures import State
+
+from src.core import settings
+from tests.conftest import reset_database
+from utils.events import Lifecycle
+from utils.providers import database
+
+
+def test_stages_run_in_order_and_ready_follows_them():
+    lifecycle = Lifecycle(State())
+    calls = []
+
+    def record(name):
+        async def handler(_):
+            calls.append((name, lifecycle.ready))
+
+        handler.__name__ = name
+        return handler
+
+    lifecycle.on_startup(record('database')).on_startup(record('warm_up'))
+    lifecycle.on_shutdown(record('cache')).on_shutdown(record('teardown'))
+
+    async def main():
+        assert not lifecycle.ready
+        await lifecycle.startup()
+        assert lifecycle.ready
+        await lifecycle.shutdown()
+        assert not lifecycle.ready
+
+    asyncio.run(main())
+    assert calls == [
+        ('database', False),
+        ('warm_up', False),
+        ('cache', False),
+        ('teardown', False),
+    ]
+
+
+def test_readiness_follows_the_lifecycle(run_app):
+    async def test(app, client):
+        ready = (await client.get('/health/ready')).status_code
+        app.state.lifecycle.ready = False
+        return ready, (await client.get('/health/ready')).status_code
+
+    assert run_app(test) == (200, 503)
+
+
+def test_teardown_waits_for_providers_retired_by_a_reload():
+    reset_database()
+    state = State()
+    setup_reload = database.setup_database_reload(
+        lambda: settings.database_config
+    )
+    disposed = []
+
+    async def main():
+        await database.setup_database(settings.database_config)(state)
+        await setup_reload(state)
+        previous = state.database_provider
+        dispose = previous.dispose
+
+        async def record_dispose():
+            disposed.append(previous)
+            await dispose()
+
+        previous.dispose = record_dispose
+        context = previous.acquire()
+        await context.connect()
+        await setup_reload.reload(state)
+        teardown = asyncio.ensure_future(database.teardown_database(state))
+        await asyncio.sleep(0.05)
+        assert not teardown.done()
+        await context.disconnect()
+        await asyncio.wait_for(teardown, 1)
+        return previous
+
+    assert disposed == [asyncio.run(main())]
@@ -0,0 +1,42 @@
+import pytest
+
+from utils import exc
+from utils.pagination import MAX_AFTER, decode_cursor, encode_cursor
+
+
+@pytest.mark.parametrize('after', [0, 1, MAX_AFTER])
+def test_cursor_round_trip(after: int):
+    assert decode_cursor(encode_cursor(after)) == after
+
+
+@pytest.mark.parametrize(
+    'cursor',
+    [
+        'a',
+        '@@@@',
+        'é',
+        'bnVsbA',  # null
+        'W10',  # []
+        'eyJhZnRlciI6IjEifQ',  # {"after": "1"}
+        'eyJhZnRlciI6dHJ1ZX0',  # {"after": true}
+        'eyJiZWZvcmUiOjF9',  # {"before": 1}
+    ],
+)
+def test_invalid_cursor_is_rejected(cursor: str):
+    with pytest.raises(exc.InvalidCursor):
+        decode_cursor(cursor)
+
+
+@pytest.mark.parametrize('after', [-1, MAX_AFTER + 1, 2**64 - 1])
+def test_out_of_range_cursor_is_rejected(after: int):
+    with pytest.raises(exc.InvalidCursor):
+        decode_cursor(encode_cursor(after))
+
+
+def test_out_of_range_cursor_is_a_client_error(run_app):
+    async def test(app, client):
+        cursor = encode_cursor(2**64 - 1)
+        response = await client.get('/users/', params={'cursor': cursor})
+        assert response.status_code == 400
+
+    run_app(test)
@@ -0,0 +1,160 @@
+import asyncio
+import threading
+
+import pytest
+
+from utils import exc
+from utils.providers.password import PasswordConfig, PasswordProvider
+
+
+def get_provider(**kwargs) -> PasswordProvider:
+    config = PasswordConfig(time_cost=1, memory_cost=8192, **kwargs)
+    return PasswordProvider(config)
+
+
+async def wait_until(predicate, timeout=5.0):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not predicate():
+        assert loop.time() < deadline
+        await asyncio.sleep(0.005)
+
+
+def test_hash_and_verify():
+    provider = get_provider()
+
+    async def main():
+        digest = await provider.hash('secret')
+        return (
+            await provider.verify('secret', digest),
+            await provider.verify('other', digest),
+        )
+
+    try:
+        assert asyncio.run(main()) == (True, False)
+    finally:
+        provider.shutdown()
+
+
+def test_saturated_pool_fails_fast():
+    provider = get_provider(workers=1, queue_size=1)
+    release = threading.Event()
+
+    async def main():
+        blocked = [
+            asyncio.ensure_future(provider._submit(release.wait))
+            for _ in range(provider.capacity)
+        ]
+        await asyncio.sleep(0)
+        with pytest.raises(exc.ServiceUnavailable):
+            await provider.hash('secret')
+        release.set()
+        await asyncio.gather(*blocked)
+        assert await provider.hash('secret')
+
+    try:
+        asyncio.run(main())
+    finally:
+        release.set()
+        provider.shutdown()
+
+
+def test_cancelled_caller_holds_its_slot_until_the_hash_ends():
+    provider = get_provider(workers=1, queue_size=0)
+    release = threading.Event()
+
+    async def main():
+        caller = asyncio.ensure_future(provider._submit(release.wait))
+        await asyncio.sleep(0.01)
+        caller.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await caller
+        # the thread is still busy, so the pool is still full
+        with pytest.raises(exc.ServiceUnavailable):
+            await provider.hash('secret')
+        release.set()
+        await wait_until(lambda: provider._pending == 0)
+        assert await provider.hash('secret')
+
+    try:
+        asyncio.run(main())
+    finally:
+        release.set()
+        provider.shutdown()
+
+
+def test_saturated_signup_answers_503(run_app, monkeypatch):
+    monkeypatch.setenv('PASSWORD_WORKERS', '1')
+    monkeypatch.setenv('PASSWORD_QUEUE_SIZE', '0')
+    release = threading.Event()
+
+    async def test(app, client):
+        provider = app.state.password_provider
+        blocked = asyncio.ensure_future(provider._submit(release.wait))
+        await asyncio.sleep(0.01)
+        response = await client.post(
+            '/users/',
+            json={
+                'name': 'User',
+                'email': 'user@example.com',
+                'password': 'secret',
+                'birthDate': '2000-01-01',
+            },
+        )
+        release.set()
+        await blocked
+        assert response.status_code == 503
+
+    try:
+        run_app(test)
+    finally:
+        release.set()
+
+
+def test_hash_many_waits_for_a_busy_pool():
+    provider = get_provider(workers=1, queue_size=0)
+    release = threading.Event()
+
+    async def main():
+        blocked = asyncio.ensure_future(provider._submit(release.wait))
+        await asyncio.sleep(0.01)
+        bulk = asyncio.ensure_future(provider.hash_many(['a', 'b', 'c']))
+        await asyncio.sleep(0.05)
+        assert not bulk.done()
+        release.set()
+        await blocked
+        digests = await bulk
+        assert [
+            await provider.verify(secret, digest)
+            for secret, digest in zip('abc', digests)
+        ] == [True] * 3
+
+    try:
+        asyncio.run(main())
+    finally:
+        release.set()
+        provider.shutdown()
+
+
+def test_hash_many_cancels_the_rest_on_failure(monkeypatch):
+    provider = get_provider(workers=1, queue_size=0)
+    hashed = []
+
+    def hash_or_fail(secret: str):
+        if secret == 'bad':
+            raise ValueError(secret)
+        hashed.append(secret)
+        return secret
+
+    monkeypatch.setattr(provider._context, 'hash', hash_or_fail)
+
+    async def main():
+        with pytest.raises(ValueError):
+            await provider.hash_many(['bad', *map(str, range(50))])
+        await asyncio.sleep(0.05)
+
+    try:
+        asyncio.run(main())
+    finally:
+        provider.shutdown()
+    assert len(hashed) < 50
@@ -0,0 +1,68 @@
+import time
+
+from utils.providers.rate_limit import SWEEP_INTERVAL, TokenBucket
+
+
+def get_bucket(rate=1.0, burst=5, idle_ttl=60.0, max_keys=100):
+    return TokenBucket(rate, burst, idle_ttl, max_keys)
+
+
+def test_burst_is_allowed_then_limited():
+    bucket = get_bucket()
+    for _ in range(5):
+        assert bucket.retry_after('ip', 1, 0) == 0
+        bucket.consume('ip', 1, 0)
+    assert bucket.retry_after('ip', 1, 0) == 1
+
+
+def test_tokens_refill_over_time():
+    bucket = get_bucket(rate=2)
+    bucket.consume('ip', 5, 0)
+    assert bucket.retry_after('ip', 1, 0) == 0.5
+    assert bucket.retry_after('ip', 1, 0.5) == 0
+
+
+def test_refill_is_capped_at_the_burst():
+    bucket = get_bucket()
+    bucket.consume('ip', 1, 0)
+    assert bucket.retry_after('ip', 6, 1000) == 0
+    bucket.consume('ip', 5, 1000)
+    assert bucket.retry_after('ip', 1, 1000) == 1
+
+
+def test_cost_above_the_burst_is_charged_as_the_burst():
+    bucket = get_bucket()
+    assert bucket.retry_after('ip', 5000, 0) == 0
+    bucket.consume('ip', 5000, 0)
+    # an empty bucket, not one in debt for the other 4995 tokens
+    assert bucket.retry_after('ip', 5, 0) == 5
+
+
+def test_keys_are_independent():
+    bucket = get_bucket()
+    bucket.consume('a', 5, 0)
+    assert bucket.retry_after('a', 1, 0) > 0
+    assert bucket.retry_after('b', 1, 0) == 0
+
+
+def test_least_recently_used_key_is_evicted_at_capacity():
+    bucket = get_bucket(max_keys=2)
+    bucket.consume('a', 5, 0)
+    bucket.consume('b', 5, 0)
+    bucket.consume('a', 0, 0)
+    bucket.consume('c', 5, 0)
+    assert len(bucket) == 2
+    # b was evicted and starts full, a kept its empty bucket
+    assert bucket.retry_after('a', 1, 0) > 0
+    assert bucket.retry_after('b', 5, 0) == 0
+
+
+def test_idle_keys_are_swept():
+    bucket = get_bucket(idle_ttl=10)
+    # the sweep is scheduled on the real monotonic clock
+    start = time.monotonic()
+    bucket.consume('idle', 1, start)
+    bucket.consume('active', 1, start + SWEEP_INTERVAL - 5)
+    assert len(bucket) == 2
+    bucket.consume('active', 1, start + SWEEP_INTERVAL + 1)
+    assert len(bucket) == 1
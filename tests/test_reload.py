@@ -0,0 +1,45 @@
+import asyncio
+
+import pytest
+
+from src.core import settings
+from tests.conftest import reset_database
+from utils import exc
+from utils.config import Config
+from utils.providers.database import DatabaseProvider
+
+
+def test_file_values_win_when_preferred(tmp_path):
+    env_file = tmp_path / '.env'
+    env_file.write_text('DB_POOL_SIZE=3\n')
+    environ = {'DB_POOL_SIZE': '20', 'DB_NAME': 'users'}
+
+    config = Config(env_file, environ=environ, prefer_file=True)
+    assert config('DB_POOL_SIZE') == '3'
+    assert config('DB_NAME') == 'users'
+    assert Config(env_file, environ=environ)('DB_POOL_SIZE') == '20'
+
+
+def test_reload_reads_the_changed_env_file(tmp_path, monkeypatch):
+    env_file = tmp_path / '.env'
+    env_file.write_text('DB_POOL_SIZE=3\n')
+    monkeypatch.setattr(settings, 'ENV_FILE', env_file)
+    monkeypatch.setenv('DB_POOL_SIZE', '20')
+
+    assert settings.load_database_config().pool_size == 3
+
+
+def test_retired_provider_refuses_checkouts():
+    reset_database()
+
+    async def main():
+        provider = DatabaseProvider(settings.database_config)
+        context = provider.acquire()
+        await provider.drain(0)
+        with pytest.raises(exc.ServiceUnavailable):
+            provider.acquire()
+        with pytest.raises(exc.ServiceUnavailable):
+            await context.connect()
+        assert provider.pool_status()['checked_out'] == 0
+
+    asyncio.run(main())
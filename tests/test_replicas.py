@@ -0,0 +1,96 @@
+import asyncio
+
+import sqlalchemy as sa
+
+from src.core import settings
+from tests.conftest import (
+    DATABASE,
+    REPLICA,
+    TMP_DIR,
+    get_replicated_provider,
+    reset_database,
+)
+from utils.providers.database import DatabaseProvider
+
+COUNT_USERS = sa.text('SELECT count(*) FROM user')
+
+
+def insert_on_primary():
+    engine = sa.create_engine(f'sqlite:///{DATABASE}')
+    with engine.begin() as conn:
+        conn.execute(
+            sa.text(
+                'INSERT INTO user (name, email, normalized_email,'
+                " external_id) VALUES ('User', 'user@example.com',"
+                " 'user@example.com', x'00000000000000000000000000000001')"
+            )
+        )
+    engine.dispose()
+
+
+async def count(provider: DatabaseProvider, **kwargs) -> int:
+    async with provider.acquire(**kwargs) as conn:
+        return (await conn.execute(COUNT_USERS)).scalar_one()
+
+
+def run(provider: DatabaseProvider, test):
+    async def main():
+        try:
+            return await test(provider)
+        finally:
+            await provider.dispose()
+
+    return asyncio.run(main())
+
+
+def test_readonly_reads_go_to_the_replica():
+    reset_database()
+    insert_on_primary()
+
+    async def test(provider):
+        return await count(provider, readonly=True), await count(provider)
+
+    assert run(get_replicated_provider(), test) == (0, 1)
+
+
+def test_unreachable_replica_falls_back_to_the_primary():
+    reset_database()
+    insert_on_primary()
+    provider = DatabaseProvider(
+        settings.database_config.copy(
+            update={'replica_hosts': str(TMP_DIR / 'missing' / 'db')}
+        )
+    )
+
+    async def test(provider):
+        return await count(provider, readonly=True), provider.replica_status()
+
+    rows, status = run(provider, test)
+    assert rows == 1
+    assert status['replica0']['healthy'] is False
+
+
+def test_recent_writes_read_from_the_primary():
+    reset_database()
+    insert_on_primary()
+    provider = DatabaseProvider(
+        settings.database_config.copy(
+            update={
+                'replica_hosts': str(REPLICA),
+                'read_your_writes_window': 60,
+            }
+        )
+    )
+
+    async def test(provider):
+        provider.record_write('user@example.com')
+        return (
+            await count(
+                provider, readonly=True, consistency_key='user@example.com'
+            ),
+            await count(
+                provider, readonly=True, consistency_key='other@example.com'
+            ),
+        )
+
+    assert run(provider, test) == (1, 0)
@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+
+from utils.singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    group = SingleFlight('test')
+    executions = []
+
+    async def fetch():
+        executions.append(1)
+        await asyncio.sleep(0.01)
+        return 'value'
+
+    async def main():
+        return await asyncio.gather(
+            *(group.do('key', fetch) for _ in range(5))
+        )
+
+    assert asyncio.run(main()) == ['value'] * 5
+    assert len(executions) == 1
+    assert group.stats() == {'calls': 5, 'shared': 4, 'ratio': 0.8}
+
+
+def test_different_keys_do_not_share():
+    group = SingleFlight('test')
+
+    async def main():
+        return await asyncio.gather(
+            group.do('a', lambda: asyncio.sleep(0, 'a')),
+            group.do('b', lambda: asyncio.sleep(0, 'b')),
+        )
+
+    assert asyncio.run(main()) == ['a', 'b']
+    assert group.shared == 0
+
+
+def test_exception_reaches_every_caller():
+    group = SingleFlight('test')
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise LookupError
+
+    async def main():
+        return await asyncio.gather(
+            *(group.do('key', fail) for _ in range(3)), return_exceptions=True
+        )
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, LookupError) for result in results)
+
+
+def test_finished_call_is_not_reused():
+    group = SingleFlight('test')
+    executions = []
+
+    async def fetch():
+        executions.append(1)
+        return len(executions)
+
+    async def main():
+        return [await group.do('key', fetch), await group.do('key', fetch)]
+
+    assert asyncio.run(main()) == [1, 2]
+
+
+def test_cancelled_caller_does_not_cancel_the_others():
+    group = SingleFlight('test')
+
+    async def fetch():
+        await asyncio.sleep(0.02)
+        return 'value'
+
+    async def main():
+        first = asyncio.create_task(group.do('key', fetch))
+        second = asyncio.create_task(group.do('key', fetch))
+        await asyncio.sleep(0.005)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(main()) == 'value'
@@ -0,0 +1,95 @@
+import base64
+import uuid
+
+import orjson
+import pytest
+
+from utils import exc
+from utils.providers.token import TokenConfig, TokenProvider, parse_keys
+
+SUBJECT = uuid.UUID('01890a5d-ac96-774b-bcce-b302099a8057')
+EMAIL = 'user@example.com'
+
+
+def get_provider(secret_keys='current:secret', **kwargs):
+    return TokenProvider(TokenConfig(secret_keys=secret_keys, **kwargs))
+
+
+def replace_payload(token: str, **claims) -> str:
+    kid, payload, signature = token.split('.')
+    data = orjson.loads(base64.urlsafe_b64decode(payload + '=='))
+    payload = base64.urlsafe_b64encode(orjson.dumps({**data, **claims}))
+    return '.'.join((kid, payload.rstrip(b'=').decode(), signature))
+
+
+def test_issued_token_is_verified():
+    provider = get_provider()
+    claims = provider.verify(provider.issue(SUBJECT, EMAIL))
+    assert claims.sub == SUBJECT
+    assert claims.email == EMAIL
+
+
+def test_tampered_payload_is_rejected():
+    provider = get_provider()
+    token = replace_payload(
+        provider.issue(SUBJECT, EMAIL), email='admin@example.com'
+    )
+    with pytest.raises(exc.InvalidOrExpiredToken):
+        provider.verify(token)
+
+
+def test_tampered_signature_is_rejected():
+    provider = get_provider()
+    token = provider.issue(SUBJECT, EMAIL)
+    last = 'A' if token[-1] != 'A' else 'B'
+    with pytest.raises(exc.InvalidOrExpiredToken):
+        provider.verify(token[:-1] + last)
+
+
+@pytest.mark.parametrize('token', ['', 'token', 'a.b', 'a.b.c.d'])
+def test_malformed_token_is_rejected(token: str):
+    with pytest.raises(exc.InvalidOrExpiredToken):
+        get_provider().verify(token)
+
+
+def test_expired_token_is_rejected():
+    provider = get_provider(ttl=0)
+    with pytest.raises(exc.InvalidOrExpiredToken):
+        provider.verify(provider.issue(SUBJECT, EMAIL))
+
+
+def test_unknown_kid_is_rejected():
+    token = get_provider('other:secret').issue(SUBJECT, EMAIL)
+    with pytest.raises(exc.InvalidOrExpiredToken):
+        get_provider().verify(token)
+
+
+def test_same_kid_with_other_secret_is_rejected():
+    token = get_provider('current:leaked').issue(SUBJECT, EMAIL)
+    with pytest.raises(exc.InvalidOrExpiredToken):
+        get_provider().verify(token)
+
+
+def test_key_rotation():
+    old_token = get_provider('old:secret1').issue(SUBJECT, EMAIL)
+    rotating = get_provider('old:secret1,new:secret2', active_key='new')
+    new_token = rotating.issue(SUBJECT, EMAIL)
+
+    assert new_token.startswith('new.')
+    assert rotating.verify(old_token).sub == SUBJECT
+
+    rotated = get_provider('new:secret2')
+    assert rotated.verify(new_token).sub == SUBJECT
+    with pytest.raises(exc.InvalidOrExpiredToken):
+        rotated.verify(old_token)
+
+
+def test_unknown_active_key_fails():
+    with pytest.raises(ValueError):
+        get_provider(active_key='missing')
+
+
+@pytest.mark.parametrize('value', ['secret', ':secret', 'kid:', 'a:b,'])
+def test_parse_keys_rejects_malformed_pairs(value: str):
+    with pytest.raises(ValueError):
+        parse_keys(value)
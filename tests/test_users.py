@@ -0,0 +1,231 @@
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from src.users import repository
+from tests.conftest import get_replicated_provider
+from utils import exc
+
+
+def get_payload(email='user@example.com', **kwargs):
+    return {
+        'name': 'User',
+        'email': email,
+        'password': 'secret',
+        'birthDate': '2000-01-01',
+        **kwargs,
+    }
+
+
+def test_create_user(run_app):
+    async def test(app, client):
+        response = await client.post('/users/', json=get_payload())
+        assert response.status_code == 200
+        body = response.json()
+        assert body['email'] == 'user@example.com'
+        assert 'password' not in body
+        fetched = await client.get('/users/user@example.com')
+        assert fetched.json() == body
+
+    run_app(test)
+
+
+def test_create_duplicate_user_conflicts(run_app):
+    async def test(app, client):
+        await client.post('/users/', json=get_payload())
+        response = await client.post('/users/', json=get_payload())
+        assert response.status_code == 409
+
+    run_app(test)
+
+
+def test_emails_differing_by_case_are_the_same_user(run_app):
+    async def test(app, client):
+        created = await client.post(
+            '/users/', json=get_payload('User@Example.com')
+        )
+        duplicate = await client.post(
+            '/users/', json=get_payload('USER@example.com')
+        )
+        assert duplicate.status_code == 409
+        fetched = await client.get('/users/uSeR@EXAMPLE.com')
+        assert fetched.status_code == 200
+        assert fetched.json() == created.json()
+        login = await client.post(
+            '/users/login',
+            json={'email': 'user@example.com', 'password': 'secret'},
+        )
+        assert login.status_code == 200
+        renamed = await client.patch(
+            '/users/USER@EXAMPLE.COM', json={'name': 'Renamed'}
+        )
+        assert renamed.json()['name'] == 'Renamed'
+
+    run_app(test)
+
+
+def test_create_returns_the_inserted_row():
+    compiled = str(
+        repository.INSERT_USER_RETURNING.compile(dialect=postgresql.dialect())
+    )
+    assert 'RETURNING' in compiled
+    assert 'normalized_email' in compiled.split('RETURNING')[1]
+
+
+def test_edit_user(run_app):
+    async def test(app, client):
+        await client.post('/users/', json=get_payload())
+        response = await client.patch(
+            '/users/user@example.com', json={'name': 'Renamed'}
+        )
+        assert response.status_code == 200
+        assert response.json()['name'] == 'Renamed'
+        fetched = await client.get('/users/user@example.com')
+        assert fetched.json()['name'] == 'Renamed'
+
+    run_app(test)
+
+
+def test_edit_email(run_app):
+    async def test(app, client):
+        await client.post('/users/', json=get_payload())
+        response = await client.patch(
+            '/users/user@example.com', json={'email': 'new@example.com'}
+        )
+        assert response.json()['email'] == 'new@example.com'
+        assert (await client.get('/users/new@example.com')).status_code == 200
+        assert (await client.get('/users/user@example.com')).status_code == 404
+
+    run_app(test)
+
+
+def test_edit_missing_user_is_not_found(run_app):
+    async def test(app, client):
+        response = await client.patch(
+            '/users/missing@example.com', json={'name': 'Nobody'}
+        )
+        assert response.status_code == 404
+
+    run_app(test)
+
+
+def test_edit_to_a_taken_email_conflicts(run_app):
+    async def test(app, client):
+        await client.post('/users/', json=get_payload())
+        await client.post('/users/', json=get_payload('other@example.com'))
+        response = await client.patch(
+            '/users/user@example.com', json={'email': 'other@example.com'}
+        )
+        assert response.status_code == 409
+
+    run_app(test)
+
+
+def test_edit_returns_the_updated_row():
+    compiled = str(
+        repository.UPDATE_USER_BY_EMAIL_RETURNING.compile(
+            dialect=postgresql.dialect()
+        )
+    )
+    assert 'RETURNING' in compiled
+
+
+def test_rehash_does_not_overwrite_a_changed_password(run_app):
+    async def test(app, client):
+        await client.post('/users/', json=get_payload())
+        users = repository.UserRepository(app.state.database_provider)
+        user = await users.retrieve('normalized_email', 'user@example.com')
+        await client.patch(
+            '/users/user@example.com', json={'password': 'changed'}
+        )
+        # a login that verified the old digest tries to write its rehash
+        assert not await users.update_password(
+            user.id_, user.password, 'rehashed'
+        )
+        login = await client.post(
+            '/users/login',
+            json={'email': 'user@example.com', 'password': 'changed'},
+        )
+        assert login.status_code == 200
+
+    run_app(test)
+
+
+def test_login_reads_from_the_primary(run_app):
+    async def test(app, client):
+        await client.post('/users/', json=get_payload())
+        primary = app.state.database_provider
+        app.state.database_provider = get_replicated_provider()
+        try:
+            users = repository.UserRepository(app.state.database_provider)
+            with pytest.raises(exc.NotFoundError):
+                await users.retrieve('normalized_email', 'user@example.com')
+            response = await client.post(
+                '/users/login',
+                json={'email': 'user@example.com', 'password': 'secret'},
+            )
+            assert response.status_code == 200
+        finally:
+            await app.state.database_provider.dispose()
+            app.state.database_provider = primary
+
+    run_app(test)
+
+
+def test_bulk_create_reports_every_row(run_app):
+    async def test(app, client):
+        await client.post('/users/', json=get_payload('taken@example.com'))
+        response = await client.post(
+            '/users/bulk',
+            json=[
+                get_payload('first@example.com'),
+                get_payload('TAKEN@example.com'),
+                get_payload('second@example.com'),
+                get_payload('First@Example.com'),
+            ],
+        )
+        assert response.status_code == 200
+        results = response.json()
+        assert [result['email'] for result in results] == [
+            'first@example.com',
+            'TAKEN@example.com',
+            'second@example.com',
+            'First@example.com',
+        ]
+        assert [result['created'] for result in results] == [
+            True,
+            False,
+            True,
+            False,
+        ]
+        assert results[0]['user']['email'] == 'first@example.com'
+        assert results[1]['error']
+        fetched = await client.get('/users/second@example.com')
+        assert fetched.status_code == 200
+
+    run_app(test)
+
+
+def test_lookup_is_keyed_by_the_emails_sent(run_app):
+    async def test(app, client):
+        await client.post('/users/', json=get_payload('b1@example.com'))
+        response = await client.post(
+            '/users/lookup',
+            json={'emails': ['B1@EXAMPLE.com', 'missing@example.com']},
+        )
+        assert response.status_code == 200
+        body = response.json()
+        assert set(body) == {'B1@EXAMPLE.com', 'missing@example.com'}
+        assert body['B1@EXAMPLE.com']['email'] == 'b1@example.com'
+        assert body['missing@example.com'] is None
+
+    run_app(test)
+
+
+def test_lookup_rejects_invalid_emails(run_app):
+    async def test(app, client):
+        response = await client.post(
+            '/users/lookup', json={'emails': ['not an email']}
+        )
+        assert response.status_code == 422
+
+    run_app(test)
@@ -58,6 +58,11 @@ class Environ(typing.MutableMapping):
             )
         self._environ.__delitem__(key)
 
+    def reset(self, *keys: typing.Any) -> None:
+        """Forgets that :param:`keys` were read,
+        allowing them to be set again before a reload"""
+        self._has_been_read.difference_update(keys)
+
     def __iter__(self):
         return iter(self._environ)
 
@@ -79,6 +84,21 @@ def _read_file(env_file: StrOrPath):
     return output
 
 
+_TRUTHY = frozenset(('1', 'true', 'yes', 'on'))
+_FALSY = frozenset(('0', 'false', 'no', 'off', ''))
+
+
+def boolean_cast(value: typing.Any) -> bool:
+    if isinstance(value, bool):
+        return value
+    normalized = str(value).strip().lower()
+    if normalized in _TRUTHY:
+        return True
+    if normalized in _FALSY:
+        return False
+    raise ValueError(value)
+
+
 def _cast(name: str, value: typing.Any, cast: CastType) -> typing.Any:
     try:
         return cast(value)
@@ -94,15 +114,19 @@ class Config:
         env_file: StrOrPath | None = None,
         environ: typing.Mapping[str, str] = environ,
         group_exceptions: bool = True,
+        prefer_file: bool = False,
     ) -> None:  # pylint: disable=redefining-outer-name
         self._environ = environ
         self._file_vals = dict[str, str]()
         self._group_exceptions = group_exceptions
+        self._prefer_file = prefer_file
         self._errors = ConfigError()
         if env_file is not None and os.path.isfile(env_file):
             self._file_vals = _read_file(env_file)
 
     def _get_value(self, name: str, default: typing.Any) -> str:
+        if self._prefer_file and name in self._file_vals:
+            return self._file_vals[name]
         value = self._environ.get(name, self._file_vals.get(name, default))
         if value is MISSING:
             raise KeyError(f'Config "{name}" is missing and has no default. ')
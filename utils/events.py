@@ -1,13 +1,77 @@
 import asyncio
+import logging
+import time
 from typing import Awaitable, Callable
 
+from fastapi import Request
 from starlette.datastructures import State
 
+Handler = Callable[[State], Awaitable[None]]
 
-def create_event_handlers(
-    state: State, *handlers: Callable[[State], Awaitable[None]]
-):
+logger = logging.getLogger(__name__)
+
+
+async def _timed(handler: Handler, state: State):
+    start = time.perf_counter()
+    await handler(state)
+    logger.info(
+        '%s finished in %.3fs',
+        handler.__name__.strip('_'),
+        time.perf_counter() - start,
+    )
+
+
+def create_event_handlers(state: State, *handlers: Handler):
     async def handler():
-        await asyncio.gather(*(handler(state) for handler in handlers))
+        start = time.perf_counter()
+        await asyncio.gather(*(_timed(handler, state) for handler in handlers))
+        logger.info(
+            '%d event handlers finished in %.3fs',
+            len(handlers),
+            time.perf_counter() - start,
+        )
 
     return handler
+
+
+class Lifecycle:
+    """Runs startup stages in registration order, the handlers of each
+    stage in parallel, then the shutdown stages in order
+
+    Obs: draining is left to the server, uvicorn stops accepting
+    connections and waits for in-flight requests before it sends the
+    lifespan shutdown, so the shutdown stages never race a request and
+    :attr:`ready` only reports whether startup has finished"""
+
+    def __init__(self, state: State) -> None:
+        self._state = state
+        self._startup = list[tuple[Handler, ...]]()
+        self._shutdown = list[tuple[Handler, ...]]()
+        self.ready = False
+
+    def on_startup(self, *handlers: Handler):
+        self._startup.append(handlers)
+        return self
+
+    def on_shutdown(self, *handlers: Handler):
+        self._shutdown.append(handlers)
+        return self
+
+    async def startup(self):
+        for handlers in self._startup:
+            await create_event_handlers(self._state, *handlers)()
+        self.ready = True
+
+    async def shutdown(self):
+        self.ready = False
+        for handlers in self._shutdown:
+            await create_event_handlers(self._state, *handlers)()
+
+    def install(self, app):
+        app.state.lifecycle = self
+        app.add_event_handler('startup', self.startup)
+        app.add_event_handler('shutdown', self.shutdown)
+
+
+def get_lifecycle(request: Request) -> Lifecycle:
+    return request.app.state.lifecycle
@@ -21,6 +21,9 @@ class APIError(Exception):
     def get_message(self):
         return _append_exclamation_mark(self._message)
 
+    def get_headers(self) -> dict[str, str]:
+        return {}
+
     @final
     def response(self) -> _Response:
         return _Response(self.get_message(), self._status)
@@ -35,6 +38,9 @@ class DatabaseError(Exception):
     def get_message(self):
         return f'An error occured with {self._target}'
 
+    def get_headers(self) -> dict[str, str]:
+        return {}
+
     @final
     def _get_message(self):
         return _append_exclamation_mark(self.get_message())
@@ -85,3 +91,26 @@ class NotAuthenticated(APIError):
 class InvalidOrExpiredToken(NotAuthenticated):
     def __init__(self) -> None:
         self._message = 'Invalid or expired token'
+
+
+class ServiceUnavailable(APIError):
+    _status = http.HTTPStatus.SERVICE_UNAVAILABLE
+
+    def __init__(self) -> None:
+        super().__init__('Service is busy, try again later')
+
+
+class TooManyRequests(APIError):
+    _status = http.HTTPStatus.TOO_MANY_REQUESTS
+
+    def __init__(self, retry_after: int) -> None:
+        super().__init__('Too many requests, try again later')
+        self._retry_after = retry_after
+
+    def get_headers(self) -> dict[str, str]:
+        return {'Retry-After': str(self._retry_after)}
+
+
+class InvalidCursor(APIError):
+    def __init__(self) -> None:
+        super().__init__('Invalid pagination cursor')
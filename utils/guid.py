@@ -1,26 +1,40 @@
 import uuid
 from typing import Any
 
+from sqlalchemy.dialects import mysql
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.engine.interfaces import Dialect
 from sqlalchemy.sql.type_api import TypeEngine
-from sqlalchemy.types import String, TypeDecorator
+from sqlalchemy.types import LargeBinary, String, TypeDecorator
 
 DEFAULT_UUID_LENGTH = 32
+BINARY_UUID_LENGTH = 16
 
 
 class GUID(TypeDecorator):   # pylint: disable=abstract-method
+    """Native uuid on postgres, elsewhere a 32 char hex string
+    or, with :param:`binary`, the 16 raw bytes of the uuid"""
+
     impl = String
     cache_ok = True
 
-    def __init__(self, *args: Any, **kwargs: Any) -> None:
-        kwargs.setdefault('length', DEFAULT_UUID_LENGTH)
+    def __init__(
+        self, *args: Any, binary: bool = False, **kwargs: Any
+    ) -> None:
+        self.binary = binary
+        kwargs.setdefault(
+            'length', BINARY_UUID_LENGTH if binary else DEFAULT_UUID_LENGTH
+        )
         super().__init__(*args, **kwargs)
 
     def load_dialect_impl(self, dialect: Dialect) -> 'TypeEngine[Any]':
         if dialect.name == 'postgresql':
             return dialect.type_descriptor(UUID)
-        return dialect.type_descriptor(String)
+        if not self.binary:
+            return dialect.type_descriptor(String(DEFAULT_UUID_LENGTH))
+        if dialect.name == 'mysql':
+            return dialect.type_descriptor(mysql.BINARY(BINARY_UUID_LENGTH))
+        return dialect.type_descriptor(LargeBinary(BINARY_UUID_LENGTH))
 
     def process_bind_param(self, value: Any, dialect: Dialect) -> Any:
         if value is None:
@@ -29,9 +43,11 @@ class GUID(TypeDecorator):   # pylint: disable=abstract-method
             return str(value)
         if not isinstance(value, uuid.UUID):
             value = uuid.UUID(value)
-        return f'%.{DEFAULT_UUID_LENGTH}x' % (value.int)
+        return value.bytes if self.binary else value.hex
 
     def process_result_value(self, value: Any, dialect: Dialect) -> Any | None:
-        if value is not None and not isinstance(value, uuid.UUID):
-            value = uuid.UUID(value)
-        return value
+        if value is None or isinstance(value, uuid.UUID):
+            return value
+        if self.binary:
+            return uuid.UUID(bytes=bytes(value))
+        return uuid.UUID(hex=value)
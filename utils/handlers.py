@@ -0,0 +1,20 @@
+from fastapi import Request
+from fastapi.responses import JSONResponse
+
+from utils import exc, metrics
+
+ERRORS = metrics.registry.counter(
+    'api_errors_total', 'Handled API errors per error type', ('error',)
+)
+
+
+async def handle_error(
+    request: Request, err: exc.APIError | exc.DatabaseError
+):  # pylint: disable=unused-argument
+    ERRORS.inc(type(err).__name__)
+    message, status_code = err.response()
+    return JSONResponse(
+        {'detail': message},
+        status_code=status_code,
+        headers=err.get_headers(),
+    )
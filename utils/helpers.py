@@ -1,8 +1,10 @@
 import asyncio
+import itertools
 from functools import wraps
-from typing import Callable, ParamSpec, TypeVar
+from typing import Callable, Iterable, Iterator, ParamSpec, TypeVar
 
 P = ParamSpec('P')
+T = TypeVar('T')
 CallableT = TypeVar('CallableT', bound=Callable)
 
 
@@ -10,7 +12,7 @@ def on_error(
     source: type[Exception],
     exc: Callable[P, Exception],
     *args: P.args,
-    **kwargs: P.kwargs
+    **kwargs: P.kwargs,
 ):
     def outer(func: CallableT) -> CallableT:
         async def _async_inner(*f_args, **f_kwargs):
@@ -34,3 +36,9 @@ def on_error(
         return wraps(func)(_inner)  # type: ignore
 
     return outer
+
+
+def chunked(iterable: Iterable[T], size: int) -> Iterator[list[T]]:
+    iterator = iter(iterable)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
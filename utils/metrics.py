@@ -0,0 +1,218 @@
+import bisect
+import time
+from typing import Any, Callable, Iterable, Iterator, Mapping
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+DEFAULT_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+CONTENT_TYPE = 'text/plain; version=0.0.4'
+
+Labels = tuple[str, ...]
+Sample = tuple[Mapping[str, str], float]
+
+
+def _format_labels(labels: Mapping[str, str]) -> str:
+    if not labels:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(
+            name,
+            str(value)
+            .replace('\\', '\\\\')
+            .replace('"', '\\"')
+            .replace('\n', '\\n'),
+        )
+        for name, value in labels.items()
+    )
+    return f'{{{pairs}}}'
+
+
+def render_samples(
+    name: str, type_: str, documentation: str, samples: Iterable[Sample]
+) -> Iterator[str]:
+    yield f'# HELP {name} {documentation}'
+    yield f'# TYPE {name} {type_}'
+    for labels, value in samples:
+        yield f'{name}{_format_labels(labels)} {value}'
+
+
+class _Metric:
+    """Base metric, values are updated without locks since every
+    recording happens on the event loop thread"""
+
+    type_ = 'untyped'
+
+    def __init__(
+        self, name: str, documentation: str, labels: Labels = ()
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._values: dict[Labels, Any] = {}
+
+    def _labels(self, values: Labels) -> dict[str, str]:
+        return dict(zip(self.labels, values))
+
+    def samples(self) -> Iterator[Sample]:
+        for values, value in list(self._values.items()):
+            yield self._labels(values), value
+
+    def collect(self) -> Iterator[str]:
+        return render_samples(
+            self.name, self.type_, self.documentation, self.samples()
+        )
+
+
+class Counter(_Metric):
+    type_ = 'counter'
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(_Metric):
+    type_ = 'gauge'
+
+    def set(self, value: float, *labels: str) -> None:
+        self._values[labels] = value
+
+
+class Histogram(_Metric):
+    type_ = 'histogram'
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Labels = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labels)
+        self.buckets = buckets
+
+    def observe(self, value: float, *labels: str) -> None:
+        state = self._values.get(labels)
+        if state is None:
+            state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        state[0][bisect.bisect_left(self.buckets, value)] += 1
+        state[1] += value
+
+    def collect(self) -> Iterator[str]:
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} {self.type_}'
+        for values, (counts, total) in list(self._values.items()):
+            labels = self._labels(values)
+            cumulative = 0
+            for bound, count in zip((*self.buckets, '+Inf'), counts):
+                cumulative += count
+                bucket_labels = _format_labels({**labels, 'le': str(bound)})
+                yield f'{self.name}_bucket{bucket_labels} {cumulative}'
+            yield f'{self.name}_sum{_format_labels(labels)} {total}'
+            yield f'{self.name}_count{_format_labels(labels)} {cumulative}'
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics = dict[str, _Metric]()
+
+    def _register(self, metric: _Metric):
+        if metric.name in self._metrics:
+            raise ValueError(f'Metric {metric.name} is already registered')
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(
+        self, name: str, documentation: str, labels: Labels = ()
+    ) -> Counter:
+        return self._register(Counter(name, documentation, labels))
+
+    def gauge(
+        self, name: str, documentation: str, labels: Labels = ()
+    ) -> Gauge:
+        return self._register(Gauge(name, documentation, labels))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labels: Labels = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labels, buckets))
+
+    def collect(self) -> Iterator[str]:
+        for metric in list(self._metrics.values()):
+            yield from metric.collect()
+
+    def render(self, *extra: Iterable[str]) -> str:
+        lines = [*self.collect()]
+        for collected in extra:
+            lines.extend(collected)
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+REQUEST_DURATION = registry.histogram(
+    'http_request_duration_seconds',
+    'HTTP request latency per route',
+    ('method', 'route'),
+)
+RESPONSES = registry.counter(
+    'http_responses_total',
+    'HTTP responses per route and status',
+    ('method', 'route', 'status'),
+)
+
+UNMATCHED_ROUTE = 'unmatched'
+
+
+class MetricsMiddleware:
+    """Records latency and status per route template,
+    unmatched paths share one label to keep cardinality bounded"""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        self._routes: dict[Callable, str] | None = None
+
+    def _route(self, scope: Scope) -> str:
+        if self._routes is None:
+            self._routes = {
+                route.endpoint: route.path
+                for route in scope['app'].routes
+                if hasattr(route, 'endpoint')
+            }
+        return self._routes.get(scope.get('endpoint'), UNMATCHED_ROUTE)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        status = 500
+        start = time.perf_counter()
+
+        async def _send(message: Message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            route = self._route(scope)
+            REQUEST_DURATION.observe(
+                time.perf_counter() - start, scope['method'], route
+            )
+            RESPONSES.inc(scope['method'], route, str(status))
@@ -1,11 +1,12 @@
 import re
-from typing import Any, TypeVar
+from typing import Any, Mapping, TypeVar
 
 import orjson
 import pydantic
 
 TO_CAMEL_REGEXP = re.compile(r'_([a-zA-Z0-9])')
 ModelT = TypeVar('ModelT', bound=pydantic.BaseModel)
+FieldAliases = tuple[tuple[str, str], ...]
 
 
 def orjson_dumps(v, *, default: Any = None):
@@ -43,3 +44,19 @@ def get_optional_model(model: type[ModelT], *exclude: str) -> type[ModelT]:
     for field in exclude:
         edit_dto.__fields__.pop(field)
     return edit_dto
+
+
+def get_field_aliases(model: type[pydantic.BaseModel]) -> FieldAliases:
+    return tuple(
+        (field.name, field.alias) for field in model.__fields__.values()
+    )
+
+
+def dump_mapping(aliases: FieldAliases, mapping: Mapping[str, Any]) -> bytes:
+    """Serializes the fields in :param:`aliases` straight from
+    :param:`mapping`, skipping model validation
+    Obs: values orjson has no native support for, such as
+    driver specific uuid subclasses, are dumped as strings"""
+    return orjson.dumps(
+        {alias: mapping[name] for name, alias in aliases}, default=str
+    )
@@ -0,0 +1,28 @@
+import base64
+
+import orjson
+
+from utils import exc
+
+# ids are 32 bit integer columns, larger values fail in the database
+MAX_AFTER = 2**31 - 1
+
+
+def encode_cursor(after: int) -> str:
+    payload = orjson.dumps({'after': after})
+    return base64.urlsafe_b64encode(payload).rstrip(b'=').decode()
+
+
+def decode_cursor(cursor: str) -> int:
+    padding = '=' * (-len(cursor) % 4)
+    try:
+        payload = orjson.loads(base64.urlsafe_b64decode(cursor + padding))
+        after = payload['after']
+    # ValueError also covers non ascii input, bad padding and bad json
+    except (ValueError, TypeError, KeyError):
+        raise exc.InvalidCursor() from None
+    if not isinstance(after, int) or isinstance(after, bool):
+        raise exc.InvalidCursor()
+    if not 0 <= after <= MAX_AFTER:
+        raise exc.InvalidCursor()
+    return after
@@ -0,0 +1,248 @@
+import enum
+import logging
+import time
+from abc import abstractmethod
+from collections import OrderedDict
+from typing import Any, Protocol
+
+from fastapi import Request
+from starlette.datastructures import State
+
+from utils import metrics
+from utils.providers.config import ProviderConfig
+
+logger = logging.getLogger(__name__)
+
+# left by writes in place of the entry, payloads are never empty
+TOMBSTONE = b''
+
+
+class CacheStats:
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def as_dict(self) -> dict[str, int]:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+
+class CacheBackend(Protocol):
+    @abstractmethod
+    async def get(self, key: str) -> bytes | None:
+        ...
+
+    @abstractmethod
+    async def set(
+        self, key: str, value: bytes, ttl: float | None = None
+    ) -> None:
+        ...
+
+    @abstractmethod
+    async def add(self, key: str, value: bytes) -> None:
+        """Sets :param:`key` only if it is not already set"""
+
+    @abstractmethod
+    async def delete(self, *keys: str) -> None:
+        ...
+
+    async def close(self) -> None:
+        return None
+
+
+class NullBackend(CacheBackend):
+    async def get(self, key: str) -> bytes | None:
+        return None
+
+    async def set(
+        self, key: str, value: bytes, ttl: float | None = None
+    ) -> None:
+        return None
+
+    async def add(self, key: str, value: bytes) -> None:
+        return None
+
+    async def delete(self, *keys: str) -> None:
+        return None
+
+
+class MemoryBackend(CacheBackend):
+    """In-process LRU cache whose entries expire after ttl seconds"""
+
+    def __init__(self, maxsize: int, ttl: float, stats: CacheStats) -> None:
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._stats = stats
+        self._items = OrderedDict[str, tuple[float, bytes]]()
+
+    async def get(self, key: str) -> bytes | None:
+        item = self._items.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at <= time.monotonic():
+            del self._items[key]
+            self._stats.evictions += 1
+            return None
+        self._items.move_to_end(key)
+        return value
+
+    async def set(
+        self, key: str, value: bytes, ttl: float | None = None
+    ) -> None:
+        ttl = self._ttl if ttl is None else ttl
+        self._items[key] = (time.monotonic() + ttl, value)
+        self._items.move_to_end(key)
+        while len(self._items) > self._maxsize:
+            self._items.popitem(last=False)
+            self._stats.evictions += 1
+
+    async def add(self, key: str, value: bytes) -> None:
+        if await self.get(key) is None:
+            await self.set(key, value)
+
+    async def delete(self, *keys: str) -> None:
+        for key in keys:
+            self._items.pop(key, None)
+
+
+class SharedBackend(CacheBackend):
+    """Cache shared between workers, backed by any client exposing
+    redis' async get/set/delete, such as redis.asyncio or a local stand-in"""
+
+    def __init__(self, client: Any, ttl: float) -> None:
+        self._client = client
+        self._ttl = ttl
+
+    @classmethod
+    def from_url(cls, url: str, ttl: float):
+        from redis import asyncio as redis
+
+        return cls(redis.from_url(url), ttl)
+
+    async def get(self, key: str) -> bytes | None:
+        return await self._client.get(key)
+
+    async def set(
+        self, key: str, value: bytes, ttl: float | None = None
+    ) -> None:
+        ttl = self._ttl if ttl is None else ttl
+        await self._client.set(key, value, ex=max(1, round(ttl)))
+
+    async def add(self, key: str, value: bytes) -> None:
+        await self._client.set(
+            key, value, ex=max(1, round(self._ttl)), nx=True
+        )
+
+    async def delete(self, *keys: str) -> None:
+        if keys:
+            await self._client.delete(*keys)
+
+    async def close(self) -> None:
+        await self._client.close()
+
+
+class Backend(str, enum.Enum):
+    NONE = 'none'
+    MEMORY = 'memory'
+    SHARED = 'shared'
+
+
+class CacheConfig(ProviderConfig):
+    """Cache configuration params
+    Obs: url is only used by the shared backend. The memory backend
+    is per process, a write only invalidates the worker handling it,
+    so use it only with a single worker.
+    For lease seconds after a write readers do not fill the key,
+    so a read that started before the write can not cache the old row"""
+
+    __env_prefix__ = 'CACHE'
+
+    backend: Backend = Backend.NONE
+    maxsize: int = 10000
+    ttl: float = 60
+    lease: float = 5
+    url: str = ''
+
+
+class CacheProvider:
+    def __init__(
+        self, config: CacheConfig, backend: CacheBackend | None = None
+    ) -> None:
+        self._config = config
+        self._stats = CacheStats()
+        self._backend = backend or self._create_backend()
+
+    def _create_backend(self) -> CacheBackend:
+        match self._config.backend:
+            case Backend.MEMORY:
+                return MemoryBackend(
+                    self._config.maxsize, self._config.ttl, self._stats
+                )
+            case Backend.SHARED:
+                return SharedBackend.from_url(
+                    self._config.url, self._config.ttl
+                )
+        return NullBackend()
+
+    async def get(self, key: str) -> bytes | None:
+        try:
+            value = await self._backend.get(key)
+        except Exception:  # pylint: disable=broad-except
+            logger.exception('Failed to read %s from cache', key)
+            value = None
+        if value == TOMBSTONE:
+            value = None
+        if value is None:
+            self._stats.misses += 1
+        else:
+            self._stats.hits += 1
+        return value
+
+    async def fill(self, key: str, value: bytes):
+        """Caches :param:`value` read after a miss, unless the key
+        was filled or invalidated since"""
+        try:
+            await self._backend.add(key, value)
+        except Exception:  # pylint: disable=broad-except
+            logger.exception('Failed to write %s to cache', key)
+
+    async def invalidate(self, *keys: str):
+        """Drops :param:`keys` after a write, leaving a tombstone
+        that keeps readers from filling them for the lease"""
+        try:
+            for key in keys:
+                await self._backend.set(key, TOMBSTONE, self._config.lease)
+        except Exception:  # pylint: disable=broad-except
+            logger.exception('Failed to invalidate %s in cache', keys)
+
+    def stats(self) -> dict[str, int]:
+        return self._stats.as_dict()
+
+    def collect(self):
+        for key, value in self.stats().items():
+            yield from metrics.render_samples(
+                f'cache_{key}_total', 'counter', f'Cache {key}', [({}, value)]
+            )
+
+    async def close(self):
+        await self._backend.close()
+
+
+def setup_cache(config: CacheConfig):
+    async def _setup_cache(state: State):
+        state.cache_provider = CacheProvider(config)
+
+    return _setup_cache
+
+
+async def teardown_cache(state: State):
+    await state.cache_provider.close()
+
+
+def get_cache_provider(request: Request):
+    return request.app.state.cache_provider
@@ -3,7 +3,7 @@ from types import NoneType
 
 from pydantic.fields import FieldInfo, ModelField, Undefined
 
-from utils.config import MISSING, Config
+from utils.config import MISSING, CastType, Config, boolean_cast
 from utils.model import Model
 
 
@@ -14,6 +14,10 @@ class ProviderConfig(Model):
     def _with_prefix(cls, name: str):
         return '_'.join(item for item in (cls.__env_prefix__, name) if item)
 
+    @classmethod
+    def env_names(cls) -> list[str]:
+        return [cls._with_prefix(name).upper() for name in cls.__fields__]
+
     @classmethod
     def from_env(cls, config: Config | None = None):
         if config is None:
@@ -34,11 +38,13 @@ class ProviderConfig(Model):
         default = _get_default(field.field_info)
         type_ = _get_type(field.outer_type_)
         if not field.allow_none:
-            return config.get(name, cast=field.type_, default=default)
+            return config.get(
+                name, cast=_get_cast(field.type_), default=default
+            )
         value = config.get(name, default=default)
         if not value:
             return None
-        return type_(value)
+        return _get_cast(type_)(value)
 
 
 def _get_default(field_info: FieldInfo):
@@ -49,6 +55,10 @@ def _get_default(field_info: FieldInfo):
     return MISSING
 
 
+def _get_cast(field_type: type) -> CastType:
+    return boolean_cast if field_type is bool else field_type
+
+
 def _get_type(field_type: type) -> type:
     is_union = typing.get_origin(field_type) is typing.Union
     if not is_union:
@@ -1,28 +1,52 @@
+import asyncio
 import enum
+import itertools
+import logging
+import signal
+import time
 from abc import abstractmethod
-from typing import Callable, Protocol, TypeGuard
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Callable, Hashable, Protocol, TypeGuard
 
 import sqlalchemy as sa
 from fastapi import Request
 from psycopg2 import errorcodes as pg_errors
-from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import default as sa_default
+from sqlalchemy.engine.interfaces import Dialect
+from sqlalchemy.exc import DBAPIError, IntegrityError
 from sqlalchemy.ext import asyncio as async_sa
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import AsyncAdaptedQueuePool, StaticPool
 from starlette.datastructures import State
 from typing_extensions import AsyncContextManager, Awaitable
 
-from utils import exc
+from utils import exc, metrics
 from utils.helpers import on_error
 from utils.providers.config import ProviderConfig
 
+PRIMARY = 'primary'
+MAX_PINNED_KEYS = 10000
+DRAIN_POLL_INTERVAL = 0.1
+
+logger = logging.getLogger(__name__)
+
 
 class DriverTypes(Protocol):
     port: int
-    has_config: bool
     async_driver: str
     sync_driver: str
 
-    config = {}
+    def get_pool_config(self, cfg: 'DatabaseConfig') -> dict[str, Any]:
+        """Returns pool params for sqlalchemy create_engine()"""
+        return {
+            'pool_size': cfg.pool_size,
+            'max_overflow': cfg.max_overflow,
+            'pool_timeout': cfg.pool_timeout,
+            'pool_recycle': cfg.pool_recycle,
+            'pool_pre_ping': cfg.pool_pre_ping,
+            'pool_use_lifo': cfg.pool_use_lifo,
+        }
 
     def get_connection_uri(self, is_async: bool, cfg: 'DatabaseConfig') -> str:
         """Returns autogenerated driver uri for sqlalchemy create_engine()"""
@@ -33,6 +57,10 @@ class DriverTypes(Protocol):
     def is_duplicate(self, exc: IntegrityError) -> bool:
         ...
 
+    @abstractmethod
+    def insert_ignoring_conflicts(self, table: sa.Table) -> sa.sql.Insert:
+        """Returns an insert that skips rows violating unique constraints"""
+
 
 class PostgresDriver(DriverTypes):
     """Driver Default values for PostgreSQL Connection"""
@@ -40,22 +68,42 @@ class PostgresDriver(DriverTypes):
     port = 5432
     async_driver = 'postgresql+asyncpg'
     sync_driver = 'postgresql+psycopg2'
-    has_config = False
+
+    def get_connection_uri(self, is_async: bool, cfg: 'DatabaseConfig') -> str:
+        uri = super().get_connection_uri(is_async, cfg)
+        if not is_async:
+            return uri
+        return (
+            f'{uri}?prepared_statement_cache_size={cfg.statement_cache_size}'
+        )
 
     def is_duplicate(self, exc: IntegrityError):
         return exc.orig.code == pg_errors.UNIQUE_VIOLATION
 
+    def insert_ignoring_conflicts(self, table: sa.Table):
+        return postgresql.insert(table).on_conflict_do_nothing()
+
 
 class SqliteDriver(DriverTypes):
     port = 0
     async_driver = 'sqlite+aiosqlite'
     sync_driver = 'sqlite'
-    has_config = True
 
-    config = {
-        'connect_args': {'check_same_thread': False},
-        'poolclass': StaticPool,
-    }
+    memory_hosts = ('', ':memory:')
+
+    def get_pool_config(self, cfg: 'DatabaseConfig') -> dict[str, Any]:
+        connect_args = {
+            'check_same_thread': False,
+            'timeout': cfg.pool_timeout,
+        }
+        if cfg.host in self.memory_hosts:
+            # every connection would open its own empty in-memory database
+            return {'connect_args': connect_args, 'poolclass': StaticPool}
+        return {
+            **super().get_pool_config(cfg),
+            'connect_args': connect_args,
+            'poolclass': AsyncAdaptedQueuePool,
+        }
 
     def get_connection_uri(self, is_async: bool, cfg: 'DatabaseConfig') -> str:
         driver_prefix = self.async_driver if is_async else self.sync_driver
@@ -66,6 +114,9 @@ class SqliteDriver(DriverTypes):
 
         return isinstance(exc.orig, sqlite3.IntegrityError)
 
+    def insert_ignoring_conflicts(self, table: sa.Table):
+        return sqlite.insert(table).on_conflict_do_nothing()
+
 
 class Driver(str, enum.Enum):
     POSTGRES = 'postgres'
@@ -74,7 +125,12 @@ class Driver(str, enum.Enum):
 
 class DatabaseConfig(ProviderConfig):
     """Database configuration params
-    Obs: pass filename as host if using sqlite"""
+    Obs: pass filename as host if using sqlite,
+    replica_hosts is a comma separated list sharing the other params,
+    statement_cache_size is the per connection prepared statement
+    cache of asyncpg and compiled_cache_size is sqlalchemy's per engine
+    cache of compiled statements, 0 disables either of them,
+    warm_up is how many connections each pool opens at startup"""
 
     __env_prefix__ = 'DB'
 
@@ -84,9 +140,26 @@ class DatabaseConfig(ProviderConfig):
     user: str = ''
     password: str = ''
     port: int | None = None
-    _pool_size: int = 20
-    _pool_recycle: int = 3600
-    _max_overflow: int = 0
+    pool_size: int = 20
+    max_overflow: int = 0
+    pool_timeout: float = 30
+    pool_recycle: int = 3600
+    pool_pre_ping: bool = False
+    pool_use_lifo: bool = False
+    replica_hosts: str = ''
+    read_your_writes_window: float = 0
+    statement_cache_size: int = 100
+    compiled_cache_size: int = 500
+    drain_timeout: float = 30
+    warm_up: int = 0
+
+    @property
+    def replicas(self) -> list[str]:
+        return [
+            host.strip()
+            for host in self.replica_hosts.split(',')
+            if host.strip()
+        ]
 
     def get_port(self):
         return self.port if self.port is not None else self.driver_type.port
@@ -95,14 +168,8 @@ class DatabaseConfig(ProviderConfig):
         return self.driver_type.get_connection_uri(is_async, self)
 
     @property
-    def pool_config(self) -> dict[str, int]:
-        if self.driver_type.has_config:
-            return self.driver_type.config
-        return {
-            'pool_size': self._pool_size,
-            'pool_recycle': self._pool_recycle,
-            'max_overflow': self._max_overflow,
-        }
+    def pool_config(self) -> dict[str, Any]:
+        return self.driver_type.get_pool_config(self)
 
     @property
     def driver_type(self) -> DriverTypes:
@@ -113,13 +180,27 @@ class DatabaseConfig(ProviderConfig):
         return _driver_mapping[self.driver]()
 
 
+def supports_returning(dialect: Dialect, statement: str = 'insert') -> bool:
+    """Returns if :param:`dialect` can run RETURNING on :param:`statement`
+    Obs: sqlalchemy 2.0 reports it per statement, 1.4 only as full_returning"""
+    support = getattr(dialect, f'{statement}_returning', None)
+    if support is None:
+        support = getattr(dialect, 'full_returning', False)
+    return bool(support)
+
+
 class ConnectionContext(AsyncContextManager):
+    """Reentrant connection holder, the connection is only released
+    when the outermost `async with` block exits"""
+
     def __init__(
         self,
         connection_factory: Callable[[], Awaitable[async_sa.AsyncConnection]],
     ) -> None:
         self._factory = connection_factory
         self._connection: async_sa.AsyncConnection | None = None
+        self._transaction: async_sa.AsyncTransaction | None = None
+        self._depth = 0
 
     async def connect(self):
         if not self.is_open(self._connection):
@@ -138,35 +219,341 @@ class ConnectionContext(AsyncContextManager):
         self._connection = None
 
     async def __aenter__(self):
-        return await self.connect()
+        connection = await self.connect()
+        self._depth += 1
+        return connection
 
     async def __aexit__(self, exc_type, exc_value, traceback):
-        await self.disconnect()
+        self._depth -= 1
+        if not self._depth:
+            await self.disconnect()
+
+    @asynccontextmanager
+    async def begin(self) -> AsyncIterator[async_sa.AsyncConnection]:
+        """Reentrant transaction, nested blocks join the outermost one,
+        which commits on success and rolls back on error"""
+        async with self as conn:
+            if self._transaction is not None:
+                yield conn
+                return
+            if conn.in_transaction():
+                # ends the transaction autobegun by previous reads
+                await conn.commit()
+            async with conn.begin() as transaction:
+                self._transaction = transaction
+                try:
+                    yield conn
+                finally:
+                    self._transaction = None
 
     def __await__(self):
         yield self.connect().__await__()
         return self
 
 
+QUERY_DURATION = metrics.registry.histogram(
+    'db_query_duration_seconds',
+    'Statement execution time per statement type',
+    ('engine', 'statement'),
+)
+CHECKOUT_DURATION = metrics.registry.histogram(
+    'db_pool_checkout_seconds',
+    'Time spent waiting for a pooled connection',
+    ('engine',),
+)
+POOL_IN_USE = metrics.registry.gauge(
+    'db_pool_in_use', 'Connections checked out of the pool', ('engine',)
+)
+POOL_OVERFLOW = metrics.registry.gauge(
+    'db_pool_overflow',
+    'Connections opened beyond the pool size',
+    ('engine',),
+)
+COMPILED_CACHE = metrics.registry.counter(
+    'db_compiled_cache_total',
+    'Statements executed per compiled cache outcome',
+    ('engine', 'result'),
+)
+
+_CACHE_RESULTS = {
+    sa_default.CACHE_HIT: 'hit',
+    sa_default.CACHE_MISS: 'miss',
+}
+
+
+def _statement_type(statement: str) -> str:
+    keyword, *_ = statement.split(None, 1) or ('UNKNOWN',)
+    return keyword.upper()
+
+
+def instrument_engine(engine: async_sa.AsyncEngine, name: str):
+    sync_engine = engine.sync_engine
+
+    def _before_execute(
+        conn, cursor, statement, parameters, context, executemany
+    ):  # pylint: disable=unused-argument,too-many-arguments
+        if context is not None:
+            context.query_start = time.perf_counter()
+
+    def _after_execute(
+        conn, cursor, statement, parameters, context, executemany
+    ):  # pylint: disable=unused-argument,too-many-arguments
+        if context is not None:
+            QUERY_DURATION.observe(
+                time.perf_counter() - context.query_start,
+                name,
+                _statement_type(statement),
+            )
+            COMPILED_CACHE.inc(
+                name, _CACHE_RESULTS.get(context.cache_hit, 'uncached')
+            )
+
+    def _update_pool(*_):
+        # engine.dispose() swaps the pool, so it is looked up on every event
+        pool = sync_engine.pool
+        if hasattr(pool, 'checkedout'):
+            POOL_IN_USE.set(pool.checkedout(), name)
+            POOL_OVERFLOW.set(max(pool.overflow(), 0), name)
+
+    sa.event.listen(sync_engine, 'before_cursor_execute', _before_execute)
+    sa.event.listen(sync_engine, 'after_cursor_execute', _after_execute)
+    sa.event.listen(sync_engine, 'checkout', _update_pool)
+    sa.event.listen(sync_engine, 'checkin', _update_pool)
+
+
+class Replica:
+    def __init__(self, name: str, engine: async_sa.AsyncEngine) -> None:
+        self.name = name
+        self.engine = engine
+        self.healthy = True
+
+
+def _pool_status(engine: async_sa.AsyncEngine, max_overflow: int):
+    pool = engine.sync_engine.pool
+    if not hasattr(pool, 'checkedout'):
+        return {'class': type(pool).__name__}
+    return {
+        'class': type(pool).__name__,
+        'size': pool.size(),
+        'checked_in': pool.checkedin(),
+        'checked_out': pool.checkedout(),
+        'overflow': max(pool.overflow(), 0),
+        'max_overflow': max_overflow,
+    }
+
+
 class DatabaseProvider:
     def __init__(self, config: DatabaseConfig) -> None:
         self._config = config
-        self._engine = async_sa.create_async_engine(
-            self._config.get_uri(is_async=True), **self._config.pool_config
+        self._engine = self._create_engine(config, PRIMARY)
+        self._replicas = [
+            Replica(
+                f'replica{index}',
+                self._create_engine(
+                    config.copy(update={'host': host}), f'replica{index}'
+                ),
+            )
+            for index, host in enumerate(config.replicas)
+        ]
+        self._next_replica = itertools.count()
+        self._pinned = dict[Hashable, float]()
+        self._current = ContextVar[ConnectionContext | None](
+            f'database_provider_{id(self)}', default=None
         )
+        self._retired = False
 
-    def acquire(self):
-        return ConnectionContext(self._engine.connect)
+    @staticmethod
+    def _create_engine(config: DatabaseConfig, name: str):
+        engine = async_sa.create_async_engine(
+            config.get_uri(is_async=True),
+            query_cache_size=config.compiled_cache_size,
+            **config.pool_config,
+        )
+        instrument_engine(engine, name)
+        return engine
+
+    def acquire(
+        self, readonly: bool = False, consistency_key: Hashable = None
+    ):
+        """Returns a connection context, read only ones go to a healthy
+        replica unless :param:`consistency_key` was written recently"""
+        if (context := self._current.get()) is not None:
+            return context
+        self._check_retired()
+        if readonly and not self.is_pinned(consistency_key):
+            return ConnectionContext(self._connect_readonly)
+        return ConnectionContext(self._connect)
+
+    @staticmethod
+    async def _checkout(engine: async_sa.AsyncEngine, name: str):
+        start = time.perf_counter()
+        connection = await engine.connect()
+        CHECKOUT_DURATION.observe(time.perf_counter() - start, name)
+        return connection
+
+    def _check_retired(self):
+        # dispose() leaves the engines usable with fresh pools, a late
+        # checkout would leak a connection to the previous database
+        if self._retired:
+            raise exc.ServiceUnavailable()
+
+    async def _connect(self):
+        self._check_retired()
+        return await self._checkout(self._engine, PRIMARY)
+
+    async def _connect_readonly(self):
+        self._check_retired()
+        healthy = [replica for replica in self._replicas if replica.healthy]
+        if healthy:
+            offset = next(self._next_replica)
+            for index in range(len(healthy)):
+                replica = healthy[(offset + index) % len(healthy)]
+                try:
+                    return await self._checkout(replica.engine, replica.name)
+                except (OSError, DBAPIError, sa.exc.TimeoutError):
+                    logger.exception('Dropping unhealthy %s', replica.name)
+                    replica.healthy = False
+        return await self._connect()
+
+    def record_write(self, *keys: Hashable):
+        """Pins reads of :param:`keys` to the primary for the
+        read your writes window, when one is configured"""
+        if not self._config.read_your_writes_window or not self._replicas:
+            return
+        now = time.monotonic()
+        if len(self._pinned) >= MAX_PINNED_KEYS:
+            self._pinned = {
+                key: deadline
+                for key, deadline in self._pinned.items()
+                if deadline > now
+            }
+        for key in keys:
+            self._pinned[key] = now + self._config.read_your_writes_window
+
+    def is_pinned(self, key: Hashable) -> bool:
+        if key is None or (deadline := self._pinned.get(key)) is None:
+            return False
+        if deadline > time.monotonic():
+            return True
+        self._pinned.pop(key, None)
+        return False
+
+    @asynccontextmanager
+    async def unit_of_work(self) -> AsyncIterator[async_sa.AsyncConnection]:
+        """Lends one connection and transaction to every acquire()
+        made in the current context until the block exits"""
+        context = self.acquire()
+        token = self._current.set(context)
+        try:
+            async with context.begin() as conn:
+                yield conn
+        finally:
+            self._current.reset(token)
+
+    def pool_status(self) -> dict[str, Any]:
+        return _pool_status(self._engine, self._config.max_overflow)
+
+    def replica_status(self) -> dict[str, dict[str, Any]]:
+        return {
+            replica.name: {
+                'healthy': replica.healthy,
+                **_pool_status(replica.engine, self._config.max_overflow),
+            }
+            for replica in self._replicas
+        }
+
+    async def _check_replica(self, replica: Replica):
+        try:
+            async with replica.engine.connect() as conn:
+                await conn.execute(sa.text('SELECT 1'))
+        except (OSError, DBAPIError, sa.exc.TimeoutError) as err:
+            # the traceback only when it goes down, not on every run
+            if replica.healthy:
+                logger.exception('Health check failed for %s', replica.name)
+            else:
+                logger.warning('%s is still down: %r', replica.name, err)
+            replica.healthy = False
+        else:
+            if not replica.healthy:
+                logger.info('%s is back up', replica.name)
+            replica.healthy = True
 
     @on_error(Exception, exc.DatabaseError, target='database')
     async def health_check(self):
+        """Checks the primary and updates which replicas take reads"""
+        await asyncio.gather(*map(self._check_replica, self._replicas))
         async with self.acquire() as conn:
             await conn.execute(sa.text('SELECT 1'))
         return True
 
+    @staticmethod
+    async def _warm_up(engine: async_sa.AsyncEngine, connections: int):
+        if not hasattr(engine.sync_engine.pool, 'checkedout'):
+            return
+        opened = await asyncio.gather(
+            *(engine.connect() for _ in range(connections)),
+            return_exceptions=True,
+        )
+        for conn in opened:
+            if isinstance(conn, BaseException):
+                logger.warning('Failed to warm up a connection: %s', conn)
+                continue
+            await conn.close()
+
+    async def warm_up(self, connections: int | None = None):
+        """Opens :param:`connections` connections, by default the
+        configured warm_up and at most the pool size, in each healthy
+        pool and returns them to the pool"""
+        if connections is None:
+            connections = self._config.warm_up
+        connections = min(connections, self._config.pool_size)
+        if connections <= 0:
+            return
+        await asyncio.gather(
+            self._warm_up(self._engine, connections),
+            *(
+                self._warm_up(replica.engine, connections)
+                for replica in self._replicas
+                if replica.healthy
+            ),
+        )
+
+    async def dispose(self):
+        await asyncio.gather(
+            self._engine.dispose(),
+            *(replica.engine.dispose() for replica in self._replicas),
+        )
+
+    def _checked_out(self) -> int:
+        return sum(
+            getattr(engine.sync_engine.pool, 'checkedout', lambda: 0)()
+            for engine in (
+                self._engine,
+                *(replica.engine for replica in self._replicas),
+            )
+        )
+
+    async def drain(self, timeout: float):
+        """Refuses new checkouts and waits up to :param:`timeout` seconds
+        for every checked out connection to be returned, then disposes
+        the engines"""
+        self._retired = True
+        deadline = time.monotonic() + timeout
+        while (pending := self._checked_out()) and time.monotonic() < deadline:
+            await asyncio.sleep(DRAIN_POLL_INTERVAL)
+        if pending:
+            logger.warning(
+                'Disposing engines with %d connections still in use',
+                pending,
+            )
+        await self.dispose()
+
     def is_duplicate(self, exc: IntegrityError) -> bool:
         return self._config.driver_type.is_duplicate(exc)
 
+    def insert_ignoring_conflicts(self, table: sa.Table) -> sa.sql.Insert:
+        return self._config.driver_type.insert_ignoring_conflicts(table)
+
 
 def setup_database(
     config: DatabaseConfig,
@@ -179,5 +566,60 @@ def setup_database(
     return _setup_database
 
 
+async def warm_up_database(state: State):
+    await state.database_provider.warm_up()
+
+
+async def teardown_database(state: State):
+    """Disposes the current provider after the ones retired by a
+    reload, whose connections the server has returned by now"""
+    await asyncio.gather(*getattr(state, 'database_drains', ()))
+    await state.database_provider.dispose()
+
+
+def setup_database_reload(load_config: Callable[[], DatabaseConfig]):
+    """Reloads the database provider on SIGHUP, the new provider
+    only replaces the current one after passing a health check and
+    the old one is disposed once its connections are returned"""
+    lock = asyncio.Lock()
+
+    async def _reload(state: State):
+        async with lock:
+            try:
+                config = load_config()
+                provider = DatabaseProvider(config)
+            except Exception:  # pylint: disable=broad-except
+                logger.exception('Failed to load database config')
+                return
+            try:
+                await provider.health_check()
+            except exc.DatabaseError:
+                logger.exception('Reloaded database is unhealthy')
+                await provider.dispose()
+                return
+            await provider.warm_up()
+            previous = state.database_provider
+            state.database_provider = provider
+            logger.info('Reloaded database provider')
+        task = asyncio.create_task(previous.drain(config.drain_timeout))
+        state.database_drains.add(task)
+        task.add_done_callback(state.database_drains.discard)
+
+    async def _setup_database_reload(state: State):
+        state.database_drains = set[asyncio.Task]()
+        if not hasattr(signal, 'SIGHUP'):
+            return
+        loop = asyncio.get_running_loop()
+        try:
+            loop.add_signal_handler(
+                signal.SIGHUP, lambda: loop.create_task(_reload(state))
+            )
+        except (NotImplementedError, RuntimeError):
+            logger.warning('SIGHUP reload is not supported on this loop')
+
+    _setup_database_reload.reload = _reload
+    return _setup_database_reload
+
+
 def get_database_provider(request: Request):
     return request.app.state.database_provider
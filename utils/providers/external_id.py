@@ -1,5 +1,100 @@
-from uuid import uuid4
+import enum
+import os
+import secrets
+import threading
+import time
+from typing import Callable
+from uuid import UUID, uuid4
 
+from starlette.datastructures import State
 
-def generate():
-    return uuid4()
+from utils.providers.config import ProviderConfig
+
+MAX_COUNTER = 0xFFF
+VERSION_7 = 0x7 << 76
+VARIANT_RFC4122 = 0b10 << 62
+
+_lock = threading.Lock()
+_last_ms = 0
+_counter = 0
+
+
+def _reset():
+    global _last_ms, _counter  # pylint: disable=global-statement
+    _last_ms = 0
+    _counter = 0
+
+
+def uuid7() -> UUID:
+    """Time ordered uuid: 48 bits of unix milliseconds, a 12 bit
+    counter keeping ids monotonic within a millisecond and 62 random bits
+    Obs: ids from different processes share only the timestamp prefix,
+    the random tail keeps them unique"""
+    global _last_ms, _counter  # pylint: disable=global-statement
+    with _lock:
+        now_ms = time.time_ns() // 1_000_000
+        if now_ms > _last_ms:
+            _last_ms = now_ms
+            # starts low so the millisecond has room left to count
+            _counter = secrets.randbits(11)
+        else:
+            # same millisecond or clock moved back, keep counting from last
+            _counter += 1
+            if _counter > MAX_COUNTER:
+                _last_ms += 1
+                _counter = 0
+        timestamp, counter = _last_ms, _counter
+    return UUID(
+        int=(
+            (timestamp & 0xFFFF_FFFF_FFFF) << 80
+            | VERSION_7
+            | counter << 64
+            | VARIANT_RFC4122
+            | secrets.randbits(62)
+        )
+    )
+
+
+if hasattr(os, 'register_at_fork'):
+    # children start a fresh sequence instead of continuing the parent's
+    os.register_at_fork(after_in_child=_reset)
+
+
+class Strategy(str, enum.Enum):
+    RANDOM = 'random'
+    TIME_ORDERED = 'time_ordered'
+
+
+GENERATORS: dict[Strategy, Callable[[], UUID]] = {
+    Strategy.RANDOM: uuid4,
+    Strategy.TIME_ORDERED: uuid7,
+}
+
+
+class ExternalIdConfig(ProviderConfig):
+    """External id params
+    Obs: time ordered ids keep index inserts append only,
+    but expose when the row was created"""
+
+    __env_prefix__ = 'EXTERNAL_ID'
+
+    strategy: Strategy = Strategy.TIME_ORDERED
+
+
+_generator: Callable[[], UUID] = uuid7
+
+
+def configure(config: ExternalIdConfig):
+    global _generator  # pylint: disable=global-statement
+    _generator = GENERATORS[config.strategy]
+
+
+def generate() -> UUID:
+    return _generator()
+
+
+def setup_external_id(config: ExternalIdConfig):
+    async def _setup_external_id(_: State):
+        configure(config)
+
+    return _setup_external_id
@@ -0,0 +1,109 @@
+import asyncio
+import logging
+import time
+from typing import Any
+
+from fastapi import Request
+from starlette.datastructures import State
+
+from utils import exc
+from utils.providers.config import ProviderConfig
+
+logger = logging.getLogger(__name__)
+
+
+class HealthConfig(ProviderConfig):
+    """Background health probe params, in seconds
+    Obs: a result older than stale_after is reported as unhealthy,
+    so a stuck probe can not keep a pod in rotation"""
+
+    __env_prefix__ = 'HEALTH'
+
+    interval: float = 5
+    stale_after: float = 15
+
+
+class HealthProbe:
+    """Checks the database every interval seconds in the background,
+    so probes read the last result instead of using a connection"""
+
+    def __init__(self, state: State, config: HealthConfig) -> None:
+        self._state = state
+        self._config = config
+        self._database = False
+        self._checked_at: float | None = None
+        self._task: asyncio.Task | None = None
+
+    async def probe(self):
+        # looked up on every run since a reload may swap the provider
+        database_provider = self._state.database_provider
+        try:
+            self._database = await database_provider.health_check()
+        except exc.DatabaseError:
+            logger.exception('Database health probe failed')
+            self._database = False
+        self._checked_at = time.monotonic()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self._config.interval)
+            try:
+                await self.probe()
+            except Exception:  # pylint: disable=broad-except
+                # the result goes stale, which reports it as unhealthy
+                logger.exception('Health probe crashed')
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    @property
+    def age(self) -> float | None:
+        if self._checked_at is None:
+            return None
+        return time.monotonic() - self._checked_at
+
+    @property
+    def healthy(self) -> bool:
+        age = self.age
+        return (
+            self._database
+            and age is not None
+            and age <= self._config.stale_after
+        )
+
+    def status(self) -> dict[str, Any]:
+        age = self.age
+        return {
+            'status': self.healthy,
+            'database': self._database,
+            'age': None if age is None else round(age, 3),
+            'replicas': self._state.database_provider.replica_status(),
+        }
+
+
+def setup_health(config: HealthConfig):
+    async def _setup_health(state: State):
+        probe = HealthProbe(state, config)
+        await probe.probe()
+        probe.start()
+        state.health_probe = probe
+
+    return _setup_health
+
+
+async def teardown_health(state: State):
+    await state.health_probe.stop()
+
+
+def get_health_probe(request: Request) -> HealthProbe:
+    return request.app.state.health_probe
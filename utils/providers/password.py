@@ -1,4 +1,29 @@
+import asyncio
+import logging
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Sequence, TypeVar
+
+from fastapi import Request
 from passlib.context import CryptContext
+from passlib.hash import argon2
+from pydantic import Field
+from starlette.datastructures import State
+
+from utils import exc
+from utils.providers.config import ProviderConfig
+
+T = TypeVar('T')
+
+MIN_MEMORY_COST = 8 * 1024
+CALIBRATION_MEMORY_COST = 64 * 1024
+MAX_TIME_COST = 32
+CALIBRATION_ROUNDS = 3
+
+logger = logging.getLogger(__name__)
 
 context = CryptContext('argon2')
 
@@ -9,3 +34,204 @@ def hash(secret: str):
 
 def verify(secret: str, digest: str) -> bool:
     return context.verify(secret, digest)
+
+
+def _measure(**params: int) -> float:
+    handler = argon2.using(**params)
+    timings = []
+    for _ in range(CALIBRATION_ROUNDS):
+        start = time.perf_counter()
+        handler.hash('calibration')
+        timings.append(time.perf_counter() - start)
+    return sorted(timings)[len(timings) // 2]
+
+
+def calibrate(target: float, memory_cost: int, parallelism: int):
+    """Returns argon2 params whose hash time is as close as possible
+    to :param:`target` seconds without going over it"""
+    elapsed = _measure(
+        time_cost=1, memory_cost=memory_cost, parallelism=parallelism
+    )
+    while elapsed > target and memory_cost // 2 >= MIN_MEMORY_COST:
+        memory_cost //= 2
+        elapsed = _measure(
+            time_cost=1, memory_cost=memory_cost, parallelism=parallelism
+        )
+    time_cost = max(1, min(MAX_TIME_COST, int(target / elapsed)))
+    while time_cost > 1:
+        elapsed = _measure(
+            time_cost=time_cost,
+            memory_cost=memory_cost,
+            parallelism=parallelism,
+        )
+        if elapsed <= target:
+            break
+        time_cost -= 1
+    return {
+        'time_cost': time_cost,
+        'memory_cost': memory_cost,
+        'parallelism': parallelism,
+    }
+
+
+class PasswordConfig(ProviderConfig):
+    """Password hashing pool params
+    Obs: argon2 releases the GIL, so threads scale with cores.
+    Unset costs fall back to the library defaults unless
+    calibrate is on, in which case they are measured at startup"""
+
+    __env_prefix__ = 'PASSWORD'
+
+    workers: int = Field(default_factory=lambda: os.cpu_count() or 1)
+    queue_size: int = 64
+    calibrate: bool = False
+    target_ms: int = 50
+    time_cost: int | None = None
+    memory_cost: int | None = None
+    parallelism: int | None = None
+
+    @property
+    def argon2_params(self) -> dict[str, int]:
+        params = {
+            'time_cost': self.time_cost,
+            'memory_cost': self.memory_cost,
+            'parallelism': self.parallelism,
+        }
+        return {key: value for key, value in params.items() if value}
+
+
+def _create_context(params: dict[str, int]):
+    return CryptContext(
+        ['argon2'], **{f'argon2__{key}': val for key, val in params.items()}
+    )
+
+
+def _is_stronger(digest: str, previous: str) -> bool:
+    """Returns if :param:`digest` costs at least as much as
+    :param:`previous` in both time and memory"""
+    new, old = argon2.from_string(digest), argon2.from_string(previous)
+    return new.rounds >= old.rounds and new.memory_cost >= old.memory_cost
+
+
+def _verify_and_update(context: CryptContext, secret: str, digest: str):
+    is_valid, new_digest = context.verify_and_update(secret, digest)
+    if new_digest is not None and not _is_stronger(new_digest, digest):
+        # calibration differs per host, a slower one must not downgrade
+        new_digest = None
+    return is_valid, new_digest
+
+
+class PasswordProvider:
+    def __init__(self, config: PasswordConfig) -> None:
+        self._config = config
+        self._executor = ThreadPoolExecutor(
+            max_workers=config.workers, thread_name_prefix='password'
+        )
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+        self._context = _create_context(config.argon2_params)
+        self._dummy_digest: str | None = None
+
+    @property
+    def capacity(self) -> int:
+        return self._config.workers + self._config.queue_size
+
+    def _release(self, _: object):
+        with self._pending_lock:
+            self._pending -= 1
+
+    async def _submit(
+        self, func: Callable[..., T], *args, admit: bool = True
+    ) -> T:
+        """Runs :param:`func` in the pool, raising ServiceUnavailable
+        when it is full unless :param:`admit` is False, in which case
+        the call waits for a worker"""
+        with self._pending_lock:
+            if admit and self._pending >= self.capacity:
+                raise exc.ServiceUnavailable()
+            self._pending += 1
+        try:
+            future = self._executor.submit(func, *args)
+        except RuntimeError:
+            self._release(None)
+            raise
+        # released when the hash ends, not when the caller stops waiting,
+        # since a cancelled caller leaves argon2 running in the thread
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    async def calibrate(self):
+        params = await asyncio.get_running_loop().run_in_executor(
+            self._executor,
+            calibrate,
+            self._config.target_ms / 1000,
+            self._config.memory_cost or CALIBRATION_MEMORY_COST,
+            self._config.parallelism or argon2.parallelism,
+        )
+        logger.info('Calibrated argon2 params: %s', params)
+        self._context = _create_context(params)
+        self._dummy_digest = None
+
+    async def hash(self, secret: str) -> str:
+        return await self._submit(self._context.hash, secret)
+
+    async def hash_many(self, secrets: Sequence[str]) -> list[str]:
+        """Hashes :param:`secrets` in parallel, using at most as many
+        slots of the pool as there are workers, waiting for them
+        instead of failing when the pool is busy"""
+        semaphore = asyncio.Semaphore(self._config.workers)
+
+        async def _hash(secret: str):
+            async with semaphore:
+                return await self._submit(
+                    self._context.hash, secret, admit=False
+                )
+
+        tasks = [asyncio.ensure_future(_hash(secret)) for secret in secrets]
+        try:
+            return list(await asyncio.gather(*tasks))
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+
+    async def verify(self, secret: str, digest: str) -> bool:
+        return await self._submit(self._context.verify, secret, digest)
+
+    async def verify_dummy(self, secret: str) -> bool:
+        """Costs as much as a real verify, for when there is no digest
+        to check, so unknown users can not be told apart by timing"""
+        if self._dummy_digest is None:
+            self._dummy_digest = await self.hash(secrets.token_urlsafe())
+        return await self.verify(secret, self._dummy_digest)
+
+    async def verify_and_update(
+        self, secret: str, digest: str
+    ) -> tuple[bool, str | None]:
+        """Returns if :param:`secret` matches :param:`digest` and,
+        when the digest uses outdated params, its replacement
+        Obs: a replacement is only returned if it is not weaker"""
+        return await self._submit(
+            _verify_and_update, self._context, secret, digest
+        )
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def setup_password(config: PasswordConfig):
+    async def _setup_password(state: State):
+        provider = PasswordProvider(config)
+        if config.calibrate:
+            await provider.calibrate()
+        state.password_provider = provider
+
+    return _setup_password
+
+
+async def teardown_password(state: State):
+    state.password_provider.shutdown()
+
+
+def get_password_provider(request: Request):
+    return request.app.state.password_provider
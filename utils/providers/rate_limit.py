@@ -0,0 +1,164 @@
+import math
+import time
+from collections import OrderedDict
+
+from fastapi import Request
+from starlette.datastructures import State
+
+from utils import exc, metrics
+from utils.providers.config import ProviderConfig
+
+SWEEP_INTERVAL = 60
+UNKNOWN_CLIENT = 'unknown'
+
+RATE_LIMITED = metrics.registry.counter(
+    'rate_limited_total', 'Requests rejected by the rate limiter', ('scope',)
+)
+
+
+class TokenBucket:
+    """Token buckets stored as `[tokens, updated_at]` per key in least
+    recently used order, keys left idle for :param:`idle_ttl` seconds
+    are evicted periodically and the oldest keys once at :param:`max_keys`
+    Obs: a cost above the burst is charged as the burst, it empties a
+    full bucket instead of leaving it in debt"""
+
+    def __init__(
+        self, rate: float, burst: int, idle_ttl: float, max_keys: int
+    ) -> None:
+        self._rate = rate
+        self._burst = burst
+        self._idle_ttl = idle_ttl
+        self._max_keys = max_keys
+        self._buckets = OrderedDict[str, list[float]]()
+        self._next_sweep = time.monotonic() + SWEEP_INTERVAL
+
+    def _refill(self, key: str, now: float) -> list[float]:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            while len(self._buckets) >= self._max_keys:
+                self._buckets.popitem(last=False)
+            bucket = self._buckets[key] = [self._burst, now]
+            return bucket
+        self._buckets.move_to_end(key)
+        tokens, updated_at = bucket
+        bucket[0] = min(self._burst, tokens + (now - updated_at) * self._rate)
+        bucket[1] = now
+        return bucket
+
+    def retry_after(self, key: str, cost: float, now: float) -> float:
+        """Returns in how many seconds :param:`cost` can be paid,
+        0 meaning it can be paid right away"""
+        tokens, _ = self._refill(key, now)
+        missing = min(cost, self._burst) - tokens
+        return max(0.0, missing / self._rate)
+
+    def consume(self, key: str, cost: float, now: float):
+        self._refill(key, now)[0] -= min(cost, self._burst)
+        if now >= self._next_sweep:
+            self._sweep(now)
+
+    def _sweep(self, now: float):
+        # least recently used first, so idle keys sit at the front
+        idle_since = now - self._idle_ttl
+        while self._buckets:
+            key, (_, updated_at) = next(iter(self._buckets.items()))
+            if updated_at > idle_since:
+                break
+            del self._buckets[key]
+        self._next_sweep = now + SWEEP_INTERVAL
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class RateLimitConfig(ProviderConfig):
+    """Rate limits for argon2 heavy routes, rates are tokens per second
+    Obs: bulk creation is charged per row to its own bucket per ip,
+    so an import does not lock the client out of signup and login.
+    trust_forwarded reads the client ip from X-Forwarded-For,
+    enable it only behind a proxy that sets that header"""
+
+    __env_prefix__ = 'RATE_LIMIT'
+
+    enabled: bool = True
+    ip_rate: float = 1
+    ip_burst: int = 20
+    email_rate: float = 0.1
+    email_burst: int = 5
+    bulk_rate: float = 50
+    bulk_burst: int = 5000
+    idle_ttl: float = 600
+    max_keys: int = 100000
+    trust_forwarded: bool = False
+
+
+class RateLimiter:
+    def __init__(self, config: RateLimitConfig) -> None:
+        self._config = config
+        self._buckets = {
+            'ip': TokenBucket(
+                config.ip_rate,
+                config.ip_burst,
+                config.idle_ttl,
+                config.max_keys,
+            ),
+            'email': TokenBucket(
+                config.email_rate,
+                config.email_burst,
+                config.idle_ttl,
+                config.max_keys,
+            ),
+            'bulk': TokenBucket(
+                config.bulk_rate,
+                config.bulk_burst,
+                config.idle_ttl,
+                config.max_keys,
+            ),
+        }
+
+    def client_ip(self, request: Request) -> str:
+        if self._config.trust_forwarded:
+            forwarded = request.headers.get('x-forwarded-for', '')
+            if client := forwarded.split(',')[0].strip():
+                return client
+        return request.client.host if request.client else UNKNOWN_CLIENT
+
+    def check(self, request: Request, email: str | None = None):
+        """Charges the client ip and, when given, :param:`email`,
+        nothing is charged unless both can pay
+        Raises TooManyRequests with the seconds to wait otherwise"""
+        keys = [('ip', self.client_ip(request))]
+        if email is not None:
+            keys.append(('email', email))
+        self._charge(keys, 1)
+
+    def check_bulk(self, request: Request, rows: int):
+        """Charges :param:`rows` to the bulk bucket of the client ip"""
+        self._charge([('bulk', self.client_ip(request))], rows)
+
+    def _charge(self, keys: list[tuple[str, str]], cost: float):
+        if not self._config.enabled:
+            return
+        now = time.monotonic()
+        for scope, key in keys:
+            wait = self._buckets[scope].retry_after(key, cost, now)
+            if wait:
+                RATE_LIMITED.inc(scope)
+                raise exc.TooManyRequests(math.ceil(wait))
+        for scope, key in keys:
+            self._buckets[scope].consume(key, cost, now)
+
+    def stats(self) -> dict[str, int]:
+        return {scope: len(bucket) for scope, bucket in self._buckets.items()}
+
+
+def setup_rate_limit(config: RateLimitConfig):
+    async def _setup_rate_limit(state: State):
+        state.rate_limiter = RateLimiter(config)
+
+    return _setup_rate_limit
+
+
+def get_rate_limiter(request: Request) -> RateLimiter:
+    return request.app.state.rate_limiter
@@ -0,0 +1,81 @@
+import asyncio
+from functools import wraps
+from typing import Any, Awaitable, Callable, Hashable, Iterator, TypeVar
+
+from utils import metrics
+
+T = TypeVar('T')
+CallableT = TypeVar('CallableT', bound=Callable[..., Awaitable[Any]])
+
+groups: list['SingleFlight'] = []
+
+
+class SingleFlight:
+    """Shares a single in-flight call between concurrent callers
+    of the same key, every caller gets its result or its exception"""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.calls = 0
+        self.shared = 0
+        self._tasks = dict[Hashable, asyncio.Task]()
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+        self.calls += 1
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._tasks[key] = task
+            task.add_done_callback(lambda _: self._tasks.pop(key, None))
+        else:
+            self.shared += 1
+        # shielded so a cancelled caller does not cancel the others
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict[str, float]:
+        return {
+            'calls': self.calls,
+            'shared': self.shared,
+            'ratio': self.shared / self.calls if self.calls else 0.0,
+        }
+
+
+def _default_key(*args: Any, **kwargs: Any) -> Hashable:
+    return args, frozenset(kwargs.items())
+
+
+def single_flight(
+    name: str | None = None, key: Callable[..., Hashable] = _default_key
+):
+    def outer(func: CallableT) -> CallableT:
+        group = SingleFlight(name or func.__qualname__)
+        groups.append(group)
+
+        @wraps(func)
+        async def inner(*args, **kwargs):
+            return await group.do(
+                key(*args, **kwargs), lambda: func(*args, **kwargs)
+            )
+
+        inner.group = group  # type: ignore
+        return inner  # type: ignore
+
+    return outer
+
+
+def stats() -> dict[str, dict[str, float]]:
+    return {group.name: group.stats() for group in groups}
+
+
+def collect() -> Iterator[str]:
+    for key, name, type_, documentation in (
+        ('calls', 'calls_total', 'counter', 'Calls to coalesced functions'),
+        ('shared', 'shared_total', 'counter', 'Calls given a shared result'),
+        ('ratio', 'ratio', 'gauge', 'Share of calls given a shared result'),
+    ):
+        yield from metrics.render_samples(
+            f'single_flight_{name}',
+            type_,
+            documentation,
+            [({'group': group.name}, group.stats()[key]) for group in groups],
+        )